@@ -19,6 +19,8 @@
         'account_reports', 'account'
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
     ],
     'images': [
     'static/description/multi-currency-button.png', 
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+from odoo import http
+from odoo.http import request
+
+
+class CurrencySelectorController(http.Controller):
+
+    @http.route('/account_report_currency_selector/currencies', type='http', auth='user', methods=['GET'])
+    def available_currencies(self):
+        """
+        Active currencies offered by the report currency selector. The list
+        is served with an ETag so the client only downloads it again when a
+        currency was added, renamed or (de)activated.
+        """
+        currencies = request.env['res.currency'].search_read(
+            [('active', '=', True)], ['id', 'name'], order='name')
+        body = json.dumps(currencies)
+        etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+
+        if etag in request.httprequest.headers.get('If-None-Match', ''):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(body, headers=headers + [('Content-Type', 'application/json')])
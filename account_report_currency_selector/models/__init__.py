@@ -1,2 +1,5 @@
 from . import account_report
 from . import currency
+from . import currency_rate
+from . import currency_rate_snapshot
+from . import currency_table
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
+
 from odoo import models, api, _, fields
 from odoo.exceptions import UserError
 from odoo.tools import SQL, formatLang
 
+CURRENCY_FORMAT_CACHE_KEY = 'account_report_currency_selector.format_contexts'
+SHARED_PERIOD_SIGNATURE = 'shared'
+
 
 class AccountReport(models.AbstractModel):
     _inherit = "account.report"
@@ -14,52 +20,195 @@ class AccountReport(models.AbstractModel):
             options["custom_currency_id"] = int(previous_options["custom_currency_id"])
         else:
             options["custom_currency_id"] = self.env.company.currency_id.id
+        options["custom_currency_ids"] = self._read_custom_currency_ids(previous_options)
 
-        currencies = self.env["res.currency"].search(
-            [("active", "=", True)], order="name"
-        )
-        options["available_currencies"] = [
-            {"id": c.id, "name": c.name} for c in currencies
-        ]
-        selected_currency = self.env["res.currency"].browse(
-            options["custom_currency_id"]
-        )
-        options["selected_currency_name"] = (
-            selected_currency.name if selected_currency.exists() else ""
-        )
+        # The currency list itself is served by the
+        # /account_report_currency_selector/currencies endpoint.
         options["date_to_ctx"] = options.get("date", {}).get("date_to")
 
         return options
 
-    def _init_currency_table(self, options):
+    def _read_custom_currency_ids(self, previous_options):
+        """
+        Target currencies requested by `previous_options`, in column order.
+        Several currencies are rendered side by side; selecting a single
+        currency outside of that list resets it.
+        """
+        previous_options = previous_options or {}
+        custom_currency_id = int(
+            previous_options.get("custom_currency_id") or self.env.company.currency_id.id
+        )
+        currency_ids = [
+            int(currency_id) for currency_id in previous_options.get("custom_currency_ids") or []
+        ]
+        if custom_currency_id not in currency_ids:
+            currency_ids = [custom_currency_id]
+        return currency_ids
+
+    def _get_custom_currency_ids(self, options):
+        return options.get("custom_currency_ids") or [options.get("custom_currency_id")]
+
+    def _is_multi_target_currency(self, options):
+        return len(self._get_custom_currency_ids(options)) > 1
+
+    def _uses_custom_currency(self, options):
         target_currency_id = options.get("custom_currency_id")
-        currency_model = self.env["res.currency"].with_context(
-            date_to=options.get("date_to_ctx"), custom_currency_id=target_currency_id
+        return self._is_multi_target_currency(options) or bool(
+            target_currency_id and target_currency_id != self.env.company.currency_id.id
         )
 
-        if (
-            not target_currency_id
-            or target_currency_id == self.env.company.currency_id.id
-        ):
+    def _init_options_column_headers(self, options, previous_options):
+        """
+        Add one header level with a column per target currency when several
+        currencies are rendered side by side; each column group then carries
+        its own `custom_currency_id` as a forced option.
+        """
+        super()._init_options_column_headers(options, previous_options)
+
+        currency_ids = self._read_custom_currency_ids(previous_options)
+        if len(currency_ids) > 1:
+            currencies = self.env["res.currency"].browse(currency_ids)
+            options["column_headers"].append([
+                {
+                    "name": currency.name,
+                    "forced_options": {"custom_currency_id": currency.id},
+                }
+                for currency in currencies
+            ])
+
+    def _init_currency_table(self, options):
+        if not self._uses_custom_currency(options):
             return super(AccountReport, self)._init_currency_table(options)
 
         if options["currency_table"]["type"] != "monocurrency":
             companies = self.env["res.company"].browse(
                 self.get_report_company_ids(options)
             )
-            currency_model._create_currency_table(
-                companies,
-                [
-                    (period_key, period["from"], period["to"])
-                    for period_key, period in options["currency_table"][
-                        "periods"
-                    ].items()
-                ],
-                use_cta_rates=options["currency_table"]["type"] == "cta",
-            )
+            cache_key = self._get_currency_table_cache_key(options)
+            period_signatures = self._get_currency_table_period_signatures(options)
+            currency_table_cache = self.env["account.report.currency.table"]
+            # Rows of other period sets (e.g. other users' dates) are kept
+            # under the same key, the autovacuum drops the stale ones.
+            # Shared rows are built along with the first periods, if there are any
+            if set(period_signatures.values()) <= currency_table_cache._get_period_signatures(cache_key):
+                return
+
+            currency_table_cache._lock(cache_key)
+            existing_signatures = currency_table_cache._get_period_signatures(cache_key)
+            missing_period_keys = {
+                period_key
+                for period_key, period_signature in period_signatures.items()
+                if period_signature not in existing_signatures
+            }
+            include_shared = SHARED_PERIOD_SIGNATURE not in existing_signatures
+            if not missing_period_keys and not include_shared:
+                return
+
+            self._prefetch_currency_table_rates(options, companies, period_keys=missing_period_keys)
+            date_periods = [
+                (period_key, period["from"], period["to"])
+                for period_key, period in options["currency_table"]["periods"].items()
+            ]
+            build_queries = []
+            for currency_id in self._get_custom_currency_ids(options):
+                shared_query, period_queries = self.env["res.currency"].with_context(
+                    date_to=options.get("date_to_ctx"), custom_currency_id=currency_id
+                )._get_currency_table_build_queries(
+                    companies,
+                    date_periods,
+                    use_cta_rates=options["currency_table"]["type"] == "cta",
+                    period_keys=missing_period_keys,
+                    include_shared=include_shared,
+                )
+                if shared_query:
+                    build_queries.append((currency_id, SHARED_PERIOD_SIGNATURE, shared_query))
+                build_queries += [
+                    (currency_id, period_signatures[period_key], period_query)
+                    for period_key, period_query in period_queries.items()
+                ]
+            currency_table_cache._fill(cache_key, build_queries)
         else:
             return super(AccountReport, self)._init_currency_table(options)
 
+    def _get_currency_table_cache_key(self, options):
+        """
+        Hash of every input of the forced-currency table but its periods:
+        companies and their currencies, fiscal year settings, target
+        currencies, rate type and builder mode. Today's date is part of it as
+        it bounds the current fiscal year used by closing rates.
+        """
+        companies = self.env["res.company"].browse(self.get_report_company_ids(options))
+        main_company = self.env.company
+        cache_inputs = {
+            "companies": sorted((company.id, company.currency_id.id) for company in companies),
+            "main_company": (
+                main_company.id,
+                main_company.fiscalyear_last_month,
+                main_company.fiscalyear_last_day,
+            ),
+            "custom_currency_ids": sorted(self._get_custom_currency_ids(options)),
+            "type": options["currency_table"]["type"],
+            "sql_builders": self.env["res.currency"]._use_sql_table_builders(),
+            "today": fields.Date.today(),
+        }
+        return hashlib.sha256(
+            json.dumps(cache_inputs, default=str).encode()
+        ).hexdigest()
+
+    def _get_currency_table_period_signatures(self, options):
+        """
+        {period_key: signature} of the currency table periods. A period's
+        rows depend on its own dates and, for historical rates, on the end of
+        the previous period.
+        """
+        period_signatures = {}
+        previous_date_to = None
+        for period_key, period in options["currency_table"]["periods"].items():
+            period_signatures[period_key] = hashlib.sha256(json.dumps(
+                [period_key, period["from"], period["to"], previous_date_to], default=str
+            ).encode()).hexdigest()
+            previous_date_to = period["to"]
+        return period_signatures
+
+    def _prefetch_currency_table_rates(self, options, companies, period_keys=None):
+        """
+        Warm the rate cache of `res.currency` for the rates the table builders
+        read in Python, over the date span of the periods (or of the periods
+        of `period_keys`).
+
+        The SQL builders look up their rates in the database and only need
+        the main company's factor at each period end: the target and main
+        company currencies. The Python builders read every company currency
+        over the whole span.
+        """
+        periods = [
+            period
+            for period_key, period in options["currency_table"]["periods"].items()
+            if period_keys is None or period_key in period_keys
+        ]
+        dates_to = [period["to"] for period in periods if period.get("to")]
+        if not dates_to:
+            return
+
+        main_company = self.env.company
+        currencies = (
+            self.env["res.currency"].browse(self._get_custom_currency_ids(options))
+            | main_company.currency_id
+        )
+        if self.env["res.currency"]._use_sql_table_builders():
+            currencies._prefetch_rates(main_company, min(dates_to), max(dates_to))
+            return
+
+        dates_from = [period.get("from") for period in periods]
+        if options["currency_table"]["type"] == "cta" or not all(dates_from):
+            # Historical rates and open periods may look up any older rate
+            date_from = None
+        else:
+            date_from = min(dates_from)
+        (currencies | companies.currency_id)._prefetch_rates(
+            companies | main_company, date_from, max(dates_to)
+        )
+
     @api.model
     def _get_currency_table(self, options) -> SQL:
         target_currency_id = options.get("custom_currency_id")
@@ -86,67 +235,41 @@ class AccountReport(models.AbstractModel):
         """
         super()._init_options_multi_currency(options, previous_options)
 
-        target_currency_id = options.get("custom_currency_id")
-        if target_currency_id and target_currency_id != self.env.company.currency_id.id:
+        if self._uses_custom_currency({
+            "custom_currency_id": previous_options.get("custom_currency_id"),
+            "custom_currency_ids": self._read_custom_currency_ids(previous_options),
+        }):
             options["multi_currency"] = True
 
-    def _build_column_dict(
-        self,
-        col_value,
-        col_data,
-        options=None,
-        currency=False,
-        digits=1,
-        column_expression=None,
-        has_sublines=False,
-        report_line_id=None,
-    ):
-        """
-        OVERRIDE: Har cell ki currency formatting ko force karein.
-        """
-        res = super()._build_column_dict(
-            col_value,
-            col_data,
-            options,
-            currency,
-            digits,
-            column_expression,
-            has_sublines,
-            report_line_id,
-        )
-
-        target_currency_id = options.get("custom_currency_id")
-        if target_currency_id and target_currency_id != self.env.company.currency_id.id:
-            if res.get("figure_type") == "monetary":
-                target_currency = self.env["res.currency"].browse(target_currency_id)
-                res["format_params"]["currency_id"] = target_currency.id
-                res["currency_symbol"] = target_currency.symbol
-
-        return res
-
     def get_report_information(self, options):
         """
         OVERRIDE: Report ke main symbol ko bhi update karein.
         """
-        info = super().get_report_information(options)
+        # Currency format contexts only live for one render
+        self.env.cr.cache.pop(CURRENCY_FORMAT_CACHE_KEY, None)
+        try:
+            info = super().get_report_information(options)
 
-        target_currency_id = options.get("custom_currency_id")
-        if target_currency_id and target_currency_id != self.env.company.currency_id.id:
-            target_currency = self.env["res.currency"].browse(target_currency_id)
-            info["report"]["company_currency_symbol"] = target_currency.symbol
-            info["report"]["company_country_code"] = "IN"
-
-            if (
-                "column_headers_render_data" in info
-                and "level_colspan" in info["column_headers_render_data"]
-            ):
-                for header_level in info["column_headers_render_data"]["level_colspan"]:
-                    if isinstance(header_level, list):
-                        for header_element in header_level:
-                            if "name" in header_element:
-                                header_element["name"] = (
-                                    f"{header_element['name']} ({target_currency.name})"
-                                )
+            target_currency_id = options.get("custom_currency_id")
+            if target_currency_id and target_currency_id != self.env.company.currency_id.id:
+                format_context = self._get_currency_format_context(options, target_currency_id)
+                info["report"]["company_currency_symbol"] = format_context["symbol"]
+                info["report"]["company_country_code"] = "IN"
+
+                if (
+                    not self._is_multi_target_currency(options)
+                    and "column_headers_render_data" in info
+                    and "level_colspan" in info["column_headers_render_data"]
+                ):
+                    for header_level in info["column_headers_render_data"]["level_colspan"]:
+                        if isinstance(header_level, list):
+                            for header_element in header_level:
+                                if "name" in header_element:
+                                    header_element["name"] = (
+                                        f"{header_element['name']} ({format_context['name']})"
+                                    )
+        finally:
+            self.env.cr.cache.pop(CURRENCY_FORMAT_CACHE_KEY, None)
 
         return info
 
@@ -175,36 +298,59 @@ class AccountReport(models.AbstractModel):
             report_line_id,
         )
 
-        if options:
-            target_currency_id = options.get("custom_currency_id")
-            if target_currency_id and target_currency_id != self.env.company.currency_id.id:
-                if res.get("figure_type") == "monetary":
-                    target_currency = self.env["res.currency"].browse(target_currency_id)
-                    res["format_params"]["currency_id"] = target_currency.id
-                    res["currency_symbol"] = target_currency.symbol
+        if options and self._uses_custom_currency(options):
+            if res.get("figure_type") == "monetary":
+                format_context = self._get_currency_format_context(
+                    options, self._get_column_currency_id(options, col_data)
+                )
+                res["format_params"]["currency_id"] = format_context["currency_id"]
+                res["currency_symbol"] = format_context["symbol"]
 
         return res
 
+    def _get_currency_format_context(self, options, currency_id):
+        """
+        Target currency data used to format monetary cells, read once per
+        currency for the current render and shared by every cell. Only plain
+        values are kept, records are browsed in the caller's environment.
+        """
+        format_contexts = self.env.cr.cache.setdefault(CURRENCY_FORMAT_CACHE_KEY, {})
+        if currency_id not in format_contexts:
+            currency = self.env["res.currency"].browse(currency_id)
+            format_contexts[currency_id] = {
+                "currency_id": currency.id,
+                "name": currency.name,
+                "symbol": currency.symbol,
+            }
+        return format_contexts[currency_id]
+
+    def _get_column_currency_id(self, options, col_data):
+        """ Target currency of the column group `col_data` belongs to. """
+        column_group = options.get("column_groups", {}).get(col_data.get("column_group_key"), {})
+        return column_group.get("forced_options", {}).get(
+            "custom_currency_id", options.get("custom_currency_id")
+        )
+
     def _format_value(self, options, value, figure_type, format_params=None):
         """
         OVERRIDE: Format ko force karein taaki woh nayi currency use kare.
         """
         target_currency_id = options.get("custom_currency_id")
+        if self._is_multi_target_currency(options) and format_params and format_params.get("currency_id"):
+            target_currency_id = format_params["currency_id"]
 
-        if target_currency_id and target_currency_id != self.env.company.currency_id.id:
+        if self._uses_custom_currency(options):
             if figure_type == "monetary":
-                target_currency = self.env["res.currency"].browse(target_currency_id)
-
-                formatLang_params = {
-                    "rounding_method": "HALF-UP",
-                    "rounding_unit": options.get("rounding_unit"),
-                    "currency_obj": target_currency,
-                }
-
                 if value is None:
                     return ""
 
-                return formatLang(self.env, value, **formatLang_params)
+                return formatLang(
+                    self.env,
+                    value,
+                    rounding_method="HALF-UP",
+                    rounding_unit=options.get("rounding_unit"),
+                    currency_obj=self.env["res.currency"].browse(target_currency_id),
+                )
 
         return super()._format_value(
             options, value, figure_type, format_params=format_params
@@ -212,10 +358,11 @@ class AccountReport(models.AbstractModel):
 
     def _init_options_currency_table(self, options, previous_options):
         super()._init_options_currency_table(options, previous_options)
-        target_currency_id = previous_options.get(
-            "custom_currency_id", self.env.company.currency_id.id
-        )
-        if target_currency_id and target_currency_id != self.env.company.currency_id.id:
+        target_currency_ids = self._read_custom_currency_ids(previous_options)
+        if any(
+            target_currency_id != self.env.company.currency_id.id
+            for target_currency_id in target_currency_ids
+        ):
             options["currency_table"]["type"] = "current"
 
     def _currency_table_apply_rate(self, value: SQL):
@@ -227,17 +374,22 @@ class AccountReport(models.AbstractModel):
         Use custom currency table ONLY when custom currency is selected.
         Otherwise fall back to base Odoo join.
         """
-        custom_currency_id = options.get("custom_currency_id")
-
-        if (
-            not custom_currency_id
-            or custom_currency_id == self.env.company.currency_id.id
-        ):
+        if not self._uses_custom_currency(options):
             return super()._currency_table_aml_join(options, aml_alias)
+
+        if options["currency_table"]["type"] == "monocurrency":
+            currency_table = SQL("account_currency_table")
+        else:
+            currency_table = self.env["account.report.currency.table"]._get_table_sql(
+                self._get_currency_table_cache_key(options),
+                options["custom_currency_id"],
+                set(self._get_currency_table_period_signatures(options).values()) | {SHARED_PERIOD_SIGNATURE},
+            )
         return SQL(
             """
-            JOIN account_currency_table
+            JOIN %(currency_table)s
                 ON %(aml)s.company_id = account_currency_table.company_id
             """,
+            currency_table=currency_table,
             aml=aml_alias,
         )
@@ -1,20 +1,40 @@
 # -*- coding: utf-8 -*-
-from odoo import models, api, fields, _
+from odoo import models, api, fields, tools, _
 from odoo.tools import date_utils, SQL
 from odoo.exceptions import UserError
 from dateutil.relativedelta import relativedelta
+from bisect import bisect_right
+from datetime import date
+
+RATE_SERIES_CACHE_KEY = 'account_report_currency_selector.rate_series'
+RATE_LOOKUP_CACHE_KEY = 'account_report_currency_selector.rate_lookups'
 
 
 class ResCurrency(models.Model):
     _inherit = "res.currency"
 
     def _get_currency_table_fiscal_year_bounds(self, main_company):
-        today_fiscal_year = main_company.compute_fiscalyear_dates(fields.Date.today())
         first_rate = self.env['res.currency.rate'].search(
             self.env['res.currency.rate']._check_company_domain(main_company), order="name ASC", limit=1)
+        # Everything the bounds depend on is part of the cache key: a new
+        # fiscal year configuration or an older first rate yields a new entry.
+        return list(self._get_fiscal_year_bounds_cached(
+            main_company.id,
+            main_company.fiscalyear_last_month,
+            main_company.fiscalyear_last_day,
+            first_rate.name,
+            fields.Date.today(),
+        ))
+
+    @api.model
+    @tools.ormcache('main_company_id', 'fiscalyear_last_month', 'fiscalyear_last_day', 'first_rate_date', 'today')
+    def _get_fiscal_year_bounds_cached(self, main_company_id, fiscalyear_last_month, fiscalyear_last_day,
+                                       first_rate_date, today):
+        main_company = self.env['res.company'].browse(main_company_id)
+        today_fiscal_year = main_company.compute_fiscalyear_dates(today)
         fiscal_year_bounds = []
-        if first_rate:
-            first_rate_fiscal_year = main_company.compute_fiscalyear_dates(first_rate.name)
+        if first_rate_date:
+            first_rate_fiscal_year = main_company.compute_fiscalyear_dates(first_rate_date)
             fiscal_year_bounds = [(None, first_rate_fiscal_year['date_from'] - relativedelta(
                 days=1))]  # Initialized to have a value for everything before the first rate
             for civil_year in range(first_rate_fiscal_year['date_from'].year, today_fiscal_year['date_from'].year):
@@ -25,7 +45,151 @@ class ResCurrency(models.Model):
         # The current fiscal year is not closed yet, so we need to use its rates for everything after it
         fiscal_year_bounds.append((today_fiscal_year['date_from'], None))
 
-        return fiscal_year_bounds
+        return tuple(fiscal_year_bounds)
+
+    # -------------------------------------------------------------------------
+    # Request-scoped rate cache
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _invalidate_rate_cache(self):
+        self.env.cr.cache.pop(RATE_SERIES_CACHE_KEY, None)
+        self.env.cr.cache.pop(RATE_LOOKUP_CACHE_KEY, None)
+
+    def _prefetch_rates(self, companies, date_from, date_to):
+        """
+        Load, with one query per currency, every rate of the currencies in
+        `self` needed to resolve `_get_cached_rate` for `companies` on any
+        date between `date_from` and `date_to`. A falsy `date_from` loads the
+        whole history up to `date_to`.
+        """
+        date_from = fields.Date.to_date(date_from) or date.min
+        date_to = fields.Date.to_date(date_to)
+        root_companies = companies.root_id
+        series_cache = self.env.cr.cache.setdefault(RATE_SERIES_CACHE_KEY, {})
+
+        for currency in self:
+            rows = self.env.execute_query(SQL(
+                """
+                (SELECT rate.company_id, rate.name, rate.rate
+                   FROM res_currency_rate rate
+                  WHERE rate.currency_id = %(currency_id)s
+                    AND (rate.company_id IS NULL OR rate.company_id IN %(root_company_ids)s)
+                    AND rate.name >= %(date_from)s
+                    AND rate.name <= %(date_to)s)
+                UNION
+                (SELECT DISTINCT ON (rate.company_id) rate.company_id, rate.name, rate.rate
+                   FROM res_currency_rate rate
+                  WHERE rate.currency_id = %(currency_id)s
+                    AND (rate.company_id IS NULL OR rate.company_id IN %(root_company_ids)s)
+                    AND rate.name < %(date_from)s
+               ORDER BY rate.company_id, rate.name DESC)
+                UNION
+                (SELECT DISTINCT ON (rate.company_id) rate.company_id, rate.name, rate.rate
+                   FROM res_currency_rate rate
+                  WHERE rate.currency_id = %(currency_id)s
+                    AND (rate.company_id IS NULL OR rate.company_id IN %(root_company_ids)s)
+               ORDER BY rate.company_id, rate.name ASC)
+                """,
+                currency_id=currency.id,
+                root_company_ids=tuple(root_companies.ids),
+                date_from=date_from,
+                date_to=date_to,
+            ))
+
+            rates_by_company = {}
+            for company_id, rate_date, rate in sorted(rows, key=lambda row: row[1]):
+                rate_dates, rate_values = rates_by_company.setdefault(company_id, ([], []))
+                rate_dates.append(rate_date)
+                rate_values.append(rate)
+
+            for root_company in root_companies:
+                series_cache[(currency.id, root_company.id)] = {
+                    'date_from': date_from,
+                    'date_to': date_to,
+                    'company_rates': rates_by_company.get(root_company.id, ([], [])),
+                    'shared_rates': rates_by_company.get(None, ([], [])),
+                }
+
+    @api.model
+    def _get_rate_from_series(self, series, rate_date):
+        """ Same precedence as `_get_rates`: company rates before shared ones,
+        latest rate before the date, otherwise the oldest known rate. """
+        for rate_dates, rate_values in (series['company_rates'], series['shared_rates']):
+            index = bisect_right(rate_dates, rate_date)
+            if index:
+                return rate_values[index - 1]
+        for rate_dates, rate_values in (series['company_rates'], series['shared_rates']):
+            if rate_values:
+                return rate_values[0]
+        return 1.0
+
+    def _get_cached_rate(self, company, rate_date):
+        """
+        Cached equivalent of `self._get_rates(company, rate_date)[self.id]`,
+        valid for the current transaction (see `_prefetch_rates`).
+        """
+        self.ensure_one()
+        rate_date = fields.Date.to_date(rate_date)
+        root_company = company.root_id
+        key = (self.id, root_company.id, rate_date)
+        lookups = self.env.cr.cache.setdefault(RATE_LOOKUP_CACHE_KEY, {})
+        if key not in lookups:
+            series = self.env.cr.cache.get(RATE_SERIES_CACHE_KEY, {}).get((self.id, root_company.id))
+            if series and series['date_from'] <= rate_date <= series['date_to']:
+                lookups[key] = self._get_rate_from_series(series, rate_date)
+            else:
+                lookups[key] = self._get_rates(company, rate_date)[self.id]
+        return lookups[key]
+
+    def _use_sql_table_builders(self):
+        """
+        The forced currency builders run fully inside the database unless the
+        'python' builder mode is configured (kept for debugging/comparison).
+        """
+        builder_mode = self.env['ir.config_parameter'].sudo().get_param(
+            'account_report_currency_selector.table_builder_mode', 'sql')
+        return builder_mode != 'python'
+
+    @api.model
+    def _get_rate_lookup_sql(self, currency_id, company_id, date) -> SQL:
+        """
+        SQL counterpart of `_get_rates` for one (currency, company, date).
+        Arguments are SQL expressions so the lookup can be correlated with
+        the outer query; `company_id` must be a root company.
+        """
+        return SQL(
+            """
+            COALESCE(
+                (SELECT lookup_rate.rate
+                   FROM res_currency_rate lookup_rate
+                  WHERE lookup_rate.currency_id = %(currency_id)s
+                    AND lookup_rate.name <= %(date)s
+                    AND (lookup_rate.company_id IS NULL OR lookup_rate.company_id = %(company_id)s)
+               ORDER BY lookup_rate.company_id, lookup_rate.name DESC
+                  LIMIT 1),
+                (SELECT lookup_rate.rate
+                   FROM res_currency_rate lookup_rate
+                  WHERE lookup_rate.currency_id = %(currency_id)s
+                    AND (lookup_rate.company_id IS NULL OR lookup_rate.company_id = %(company_id)s)
+               ORDER BY lookup_rate.company_id, lookup_rate.name ASC
+                  LIMIT 1),
+                1.0
+            )
+            """,
+            currency_id=currency_id,
+            company_id=company_id,
+            date=date,
+        )
+
+    @api.model
+    def _get_empty_table_builder(self) -> SQL:
+        return SQL(
+            """
+            SELECT NULL::INTEGER, NULL::VARCHAR, NULL::DATE, NULL::DATE, NULL::VARCHAR, NULL::NUMERIC
+             WHERE false
+            """
+        )
 
     def _base_get_table_builder_closing(self, period_key, main_company, other_companies, date_to,
                                         main_company_unit_factor) -> SQL:
@@ -171,6 +335,52 @@ class ResCurrency(models.Model):
         - If custom target currency found in context, use that instead of main company currency.
         - Otherwise run normal Odoo logic.
         """
+        self._cr.execute(
+            SQL(
+                """
+                DROP TABLE IF EXISTS account_currency_table;
+
+                CREATE
+                TEMPORARY TABLE account_currency_table
+            (company_id, period_key, date_from, date_next, rate_type, rate)
+            ON COMMIT DROP
+                AS (
+                %(currency_table_build_query)s
+                );
+
+                CREATE INDEX account_currency_table_index
+                    ON account_currency_table (company_id, rate_type, date_from, date_next);
+
+                ANALYZE
+                account_currency_table;
+                """,
+                currency_table_build_query=self._get_currency_table_build_query(
+                    companies, date_periods, use_cta_rates=use_cta_rates
+                ),
+            )
+        )
+
+    def _get_currency_table_build_query(self, companies, date_periods, use_cta_rates=False) -> SQL:
+        """
+        Query returning the rows of the currency table, as
+        (company_id, period_key, date_from, date_next, rate_type, rate).
+        """
+        shared_builder, period_builders = self._get_currency_table_build_queries(
+            companies, date_periods, use_cta_rates=use_cta_rates
+        )
+        table_builders = ([shared_builder] if shared_builder else []) + list(period_builders.values())
+        return SQL(" UNION ALL ").join(
+            SQL("(%s)", builder) for builder in table_builders
+        )
+
+    def _get_currency_table_build_queries(self, companies, date_periods, use_cta_rates=False,
+                                          period_keys=None, include_shared=True):
+        """
+        Rows of the currency table split by period, so they can be built
+        incrementally. Returns the query of the rows shared by every period
+        (None if there are none or `include_shared` is False) and a
+        {period_key: query} dict, restricted to `period_keys` when given.
+        """
         forced_currency_id = self.env.context.get("custom_currency_id")
         main_company = self.env.company
 
@@ -184,24 +394,27 @@ class ResCurrency(models.Model):
         )
         other_companies = companies - domestic_currency_companies
 
-        table_builders = []
-        if domestic_currency_companies:
-            table_builders += [
-                self._get_table_builder_domestic_currency(
-                    domestic_currency_companies, use_cta_rates
-                )
-            ]
+        shared_builder = None
+        if domestic_currency_companies and include_shared:
+            shared_builder = self._get_table_builder_domestic_currency(
+                domestic_currency_companies, use_cta_rates
+            )
 
+        period_builders = {}
         last_date_to = None
         for period_key, date_from, date_to in date_periods:
+            if period_keys is not None and period_key not in period_keys:
+                last_date_to = date_to
+                continue
+
             main_company_unit_factor = self._compute_rate_factor(main_company, date_to)
             if not main_company_unit_factor:
-                main_company_unit_factor = main_company.currency_id._get_rates(
+                main_company_unit_factor = main_company.currency_id._get_cached_rate(
                     main_company, date_to
-                )[main_company.currency_id.id]
+                )
 
             if use_cta_rates:
-                table_builders += [
+                table_builders = [
                     self._get_table_builder_closing(
                         period_key,
                         main_company,
@@ -226,8 +439,7 @@ class ResCurrency(models.Model):
                     ),
                 ]
             else:
-
-                table_builders += [
+                table_builders = [
                     self._get_table_builder_current(
                         period_key,
                         main_company,
@@ -236,33 +448,13 @@ class ResCurrency(models.Model):
                         main_company_unit_factor,
                     )
                 ]
+            period_builders[period_key] = SQL(" UNION ALL ").join(
+                SQL("(%s)", builder) for builder in table_builders
+            )
 
             last_date_to = date_to
 
-        self._cr.execute(
-            SQL(
-                """
-                DROP TABLE IF EXISTS account_currency_table;
-
-                CREATE
-                TEMPORARY TABLE account_currency_table
-            (company_id, period_key, date_from, date_next, rate_type, rate)
-            ON COMMIT DROP
-                AS (
-                %(currency_table_build_query)s
-                );
-
-                CREATE INDEX account_currency_table_index
-                    ON account_currency_table (company_id, rate_type, date_from, date_next);
-
-                ANALYZE
-                account_currency_table;
-                """,
-                currency_table_build_query=SQL(" UNION ALL ").join(
-                    SQL("(%s)", builder) for builder in table_builders
-                ),
-            )
-        )
+        return shared_builder, period_builders
 
     def _compute_rate_factor(self, main_company, date_to):
         """
@@ -276,12 +468,8 @@ class ResCurrency(models.Model):
 
         company_currency = main_company.currency_id
 
-        company_rate = company_currency._get_rates(main_company, date_to)[
-            company_currency.id
-        ]
-        target_rate = target_currency._get_rates(main_company, date_to)[
-            target_currency.id
-        ]
+        company_rate = company_currency._get_cached_rate(main_company, date_to)
+        target_rate = target_currency._get_cached_rate(main_company, date_to)
 
         if company_rate == 0:
             company_rate = 1
@@ -299,18 +487,20 @@ class ResCurrency(models.Model):
     ):
         """Correct 'current' rate builder — works for custom target currency."""
         forced_currency_id = self.env.context.get("custom_currency_id")
+        if forced_currency_id and self._use_sql_table_builders():
+            return self._get_sql_table_builder_current(
+                period_key, main_company, other_companies, date_to
+            )
         if forced_currency_id:
             target_currency = self.env["res.currency"].browse(forced_currency_id)
         else:
             target_currency = main_company.currency_id
 
-        target_rate = target_currency._get_rates(main_company, date_to)[
-            target_currency.id
-        ]
+        target_rate = target_currency._get_cached_rate(main_company, date_to)
 
         company_rates = []
         for comp in other_companies:
-            comp_rate = comp.currency_id._get_rates(comp, date_to)[comp.currency_id.id]
+            comp_rate = comp.currency_id._get_cached_rate(comp, date_to)
             conversion_rate = target_rate / comp_rate
 
             company_rates.append(
@@ -348,18 +538,21 @@ class ResCurrency(models.Model):
                 main_company_unit_factor,
             )
 
+        if self._use_sql_table_builders():
+            return self._get_sql_table_builder_closing(
+                period_key, main_company, other_companies, date_to
+            )
+
         if forced_currency_id:
             target_currency = self.env["res.currency"].browse(forced_currency_id)
-            target_rate = target_currency._get_rates(main_company, date_to)[
-                target_currency.id
-            ]
+            target_rate = target_currency._get_cached_rate(main_company, date_to)
 
             company_rows = []
 
             fiscal_year_bounds = self._get_currency_table_fiscal_year_bounds(main_company)
 
             for comp in other_companies:
-                comp_rate = comp.currency_id._get_rates(comp, date_to)[comp.currency_id.id]
+                comp_rate = comp.currency_id._get_cached_rate(comp, date_to)
                 conversion_rate = target_rate / comp_rate
 
                 for fy_from, fy_to in fiscal_year_bounds:
@@ -404,6 +597,11 @@ class ResCurrency(models.Model):
                 date_exclude,
             )
 
+        if self._use_sql_table_builders():
+            return self._get_sql_table_builder_historical(
+                main_company, other_companies, date_to
+            )
+
         target_currency = self.env["res.currency"].browse(forced_currency_id)
 
         rows = []
@@ -415,22 +613,20 @@ class ResCurrency(models.Model):
                     ("company_id", "=", main_company.id),
                     ("name", "<=", date_to),
                 ],
-                order="name DESC",
+                order="name ASC",
             )
 
-            for rate in comp_rates:
-                tr = target_currency._get_rates(main_company, rate.name)[
-                    target_currency.id
-                ]
-                cr = rate.rate
-                conversion_rate = tr / cr
-
+            conversion_rates = [
+                (rate.name, target_currency._get_cached_rate(main_company, rate.name) / rate.rate)
+                for rate in comp_rates
+            ]
+            for range_from, range_next, conversion_rate in self._get_rate_ranges(conversion_rates):
                 rows.append(
                     SQL(
-                        "(%(cid)s, NULL, %(date_from)s, %(date_next)s, 'historical', %(rate)s)",
+                        "(%(cid)s, NULL, %(date_from)s::DATE, %(date_next)s::DATE, 'historical', %(rate)s)",
                         cid=comp.id,
-                        date_from=rate.name,
-                        date_next=None,
+                        date_from=range_from,
+                        date_next=range_next,
                         rate=conversion_rate,
                     )
                 )
@@ -447,6 +643,22 @@ class ResCurrency(models.Model):
             values=SQL(", ").join(rows),
         )
 
+    @api.model
+    def _get_rate_ranges(self, conversion_rates):
+        """
+        Run-length compress (date, rate) pairs sorted by date into
+        [date_from, date_next) ranges of identical rates. The last range is
+        left open (date_next is None).
+        """
+        ranges = []
+        for rate_date, conversion_rate in conversion_rates:
+            if ranges and ranges[-1][2] == conversion_rate:
+                continue
+            if ranges:
+                ranges[-1][1] = rate_date
+            ranges.append([rate_date, None, conversion_rate])
+        return [tuple(rate_range) for rate_range in ranges]
+
     def _get_table_builder_average(
             self,
             period_key,
@@ -468,65 +680,337 @@ class ResCurrency(models.Model):
                 main_company_unit_factor,
             )
 
+        if self._use_sql_table_builders():
+            return self._get_sql_table_builder_average(
+                period_key, main_company, other_companies, date_from, date_to
+            )
+
         target_currency = self.env["res.currency"].browse(forced_currency_id)
+        date_to = fields.Date.to_date(date_to)
 
-        rows = []
+        # One pass over every company rate of the period, all currencies at once
+        rate_series = {}
+        for currency_id, rate_date, rate in self.env.execute_query(SQL(
+            """
+            SELECT rate.currency_id, rate.name, rate.rate
+              FROM res_currency_rate rate
+             WHERE rate.currency_id IN %(currency_ids)s
+               AND rate.company_id = %(main_company_id)s
+               AND %(date_from_condition)s
+               AND rate.name <= %(date_to)s
+          ORDER BY rate.currency_id, rate.name
+            """,
+            currency_ids=tuple(other_companies.currency_id.ids) or (None,),
+            main_company_id=main_company.id,
+            date_from_condition=SQL("rate.name >= %s", date_from) if date_from else SQL("TRUE"),
+            date_to=date_to,
+        )):
+            rate_series.setdefault(currency_id, []).append((rate_date, rate))
 
-        for comp in other_companies:
-            comp_rates = self.env["res.currency.rate"].search(
-                [
-                    ("currency_id", "=", comp.currency_id.id),
-                    ("company_id", "=", main_company.id),
-                    ("name", ">=", date_from),
-                    ("name", "<=", date_to),
-                ],
-                order="name ASC",
+        average_rates = {
+            currency_id: self._get_time_weighted_average_rate(
+                series, date_to, target_currency, main_company
             )
+            for currency_id, series in rate_series.items()
+        }
 
-            if not comp_rates:
-                continue
+        rows = [
+            SQL(
+                "(%(cid)s, %(period)s, NULL, NULL, 'average', %(rate)s)",
+                cid=comp.id,
+                period=period_key,
+                rate=average_rates[comp.currency_id.id],
+            )
+            for comp in other_companies
+            if comp.currency_id.id in average_rates
+        ]
 
-            day_segments = []
-            total_days = 0
+        if not rows:
+            return SQL("SELECT 1 WHERE false")
 
-            for i, rate in enumerate(comp_rates):
-                next_date = (
-                    comp_rates[i + 1].name if i + 1 < len(comp_rates) else date_to
-                )
+        return SQL(
+            """
+            SELECT *
+            FROM (VALUES
+                      %(values)s) AS t(company_id, period_key, date_from, date_next, rate_type, rate)
+            """,
+            values=SQL(", ").join(rows),
+        )
 
-                days = (
-                        fields.Date.from_string(next_date)
-                        - fields.Date.from_string(rate.name)
-                ).days
-                total_days += days
+    @api.model
+    def _get_time_weighted_average_rate(self, rate_series, date_to, target_currency, main_company):
+        """
+        Average conversion rate (target rate / company rate) over a period,
+        each rate of `rate_series` (sorted (date, rate) pairs) being weighted
+        by the number of days until the next one, or until `date_to`.
+        """
+        weighted_sum = 0.0
+        total_days = 0
+        next_dates = [rate_date for rate_date, _rate in rate_series[1:]] + [date_to]
+        for (rate_date, company_rate), next_date in zip(rate_series, next_dates):
+            days = (next_date - rate_date).days
+            target_rate = target_currency._get_cached_rate(main_company, rate_date)
+            weighted_sum += days * target_rate / company_rate
+            total_days += days
+        return weighted_sum / total_days if total_days else 1
+
+    # -------------------------------------------------------------------------
+    # Set-based builders (forced target currency)
+    # -------------------------------------------------------------------------
+
+    def _get_sql_conversion_rate(self, main_company, date) -> SQL:
+        """
+        Conversion rate expression (target rate / company currency rate) for
+        `other_company`, evaluated at `date`. The target rate is read for the
+        main company, the company rate for the root of `other_company`.
+        """
+        target_rate = self._get_rate_lookup_sql(
+            self.env.context["custom_currency_id"],
+            main_company.root_id.id,
+            date,
+        )
+        company_rate = self._get_rate_lookup_sql(
+            SQL("other_company.currency_id"),
+            SQL("SPLIT_PART(other_company.parent_path, '/', 1)::INTEGER"),
+            date,
+        )
+        conversion_rate = SQL("%s / %s", target_rate, company_rate)
 
-                tr = target_currency._get_rates(main_company, rate.name)[
-                    target_currency.id
-                ]
-                cr = rate.rate
-                conversion_rate = tr / cr
+        date = fields.Date.to_date(date)
+        if self.env.context.get("skip_rate_snapshots") or date != date_utils.end_of(date, "month"):
+            return conversion_rate
+        return SQL(
+            """
+            COALESCE(
+                (SELECT snapshot.rate
+                   FROM res_currency_rate_snapshot snapshot
+                  WHERE snapshot.main_company_id = %(main_company_id)s
+                    AND snapshot.company_id = other_company.id
+                    AND snapshot.target_currency_id = %(target_currency_id)s
+                    AND snapshot.date = %(date)s
+                    AND snapshot.rate_type = 'closing'),
+                %(conversion_rate)s
+            )
+            """,
+            main_company_id=main_company.id,
+            target_currency_id=self.env.context["custom_currency_id"],
+            date=date,
+            conversion_rate=conversion_rate,
+        )
 
-                day_segments.append(days * conversion_rate)
+    def _is_snapshot_month(self, date_from, date_to):
+        """ Whether the period is exactly one calendar month, so its average
+        rate can be read from `res.currency.rate.snapshot`. """
+        if self.env.context.get("skip_rate_snapshots") or not date_from:
+            return False
+        date_from, date_to = fields.Date.to_date(date_from), fields.Date.to_date(date_to)
+        return (
+            date_from == date_utils.start_of(date_from, "month")
+            and date_to == date_utils.end_of(date_from, "month")
+        )
 
-            average_rate = sum(day_segments) / total_days if total_days else 1
+    def _get_sql_table_builder_current(self, period_key, main_company, other_companies, date_to) -> SQL:
+        if not other_companies:
+            return self._get_empty_table_builder()
 
-            rows.append(
-                SQL(
-                    "(%(cid)s, %(period)s, NULL, NULL, 'average', %(rate)s)",
-                    cid=comp.id,
-                    period=period_key,
-                    rate=average_rate,
+        return SQL(
+            """
+            SELECT other_company.id,
+                   %(period_key)s,
+                   CAST(NULL AS DATE),
+                   CAST(NULL AS DATE),
+                   'current',
+                   %(conversion_rate)s
+              FROM res_company other_company
+             WHERE other_company.id IN %(other_company_ids)s
+            """,
+            period_key=period_key,
+            conversion_rate=self._get_sql_conversion_rate(main_company, date_to),
+            other_company_ids=tuple(other_companies.ids),
+        )
+
+    def _get_sql_table_builder_closing(self, period_key, main_company, other_companies, date_to) -> SQL:
+        if not other_companies:
+            return self._get_empty_table_builder()
+
+        fiscal_year_bounds = self._get_currency_table_fiscal_year_bounds(main_company)
+
+        return SQL(
+            """
+            SELECT other_company.id,
+                   %(period_key)s,
+                   fiscal_year_bounds.date_from,
+                   fiscal_year_bounds.date_to,
+                   'closing',
+                   company_rate.conversion_rate
+              FROM res_company other_company
+              JOIN LATERAL (SELECT %(conversion_rate)s AS conversion_rate) AS company_rate ON TRUE
+              CROSS JOIN (VALUES %(fiscal_year_bounds_values)s) AS fiscal_year_bounds(date_from, date_to)
+             WHERE other_company.id IN %(other_company_ids)s
+            """,
+            period_key=period_key,
+            conversion_rate=self._get_sql_conversion_rate(main_company, date_to),
+            fiscal_year_bounds_values=SQL(",").join(
+                SQL("(%(fy_from)s::date,%(fy_to)s::date)", fy_from=fy_from, fy_to=fy_to)
+                for fy_from, fy_to in fiscal_year_bounds
+            ),
+            other_company_ids=tuple(other_companies.ids),
+        )
+
+    def _get_sql_table_builder_historical(self, main_company, other_companies, date_to) -> SQL:
+        """
+        One row per [date_from, date_next) range of identical conversion
+        rates (gaps and islands over the company rate series), the last range
+        of each company being open-ended.
+        """
+        if not other_companies:
+            return self._get_empty_table_builder()
+
+        target_rate = self._get_rate_lookup_sql(
+            self.env.context["custom_currency_id"],
+            main_company.root_id.id,
+            SQL("rate.name"),
+        )
+        return SQL(
+            """
+            SELECT island.company_id,
+                   CAST(NULL AS VARCHAR),
+                   MIN(island.date_from),
+                   (ARRAY_AGG(island.date_next ORDER BY island.date_from DESC))[1],
+                   'historical',
+                   island.conversion_rate
+              FROM (
+                    SELECT rate_change.*,
+                           SUM(rate_change.is_new_range) OVER (
+                               PARTITION BY rate_change.company_id ORDER BY rate_change.date_from
+                           ) AS range_number
+                      FROM (
+                            SELECT conversion.*,
+                                   LEAD(conversion.date_from) OVER company_window AS date_next,
+                                   CASE
+                                       WHEN conversion.conversion_rate IS NOT DISTINCT FROM LAG(conversion.conversion_rate) OVER company_window
+                                       THEN 0 ELSE 1
+                                   END AS is_new_range
+                              FROM (
+                                    SELECT other_company.id AS company_id,
+                                           rate.name AS date_from,
+                                           %(target_rate)s / rate.rate AS conversion_rate
+                                      FROM res_company other_company
+                                      JOIN res_currency_rate rate
+                                        ON rate.currency_id = other_company.currency_id
+                                       AND rate.company_id = %(main_company_id)s
+                                       AND rate.name <= %(date_to)s
+                                     WHERE other_company.id IN %(other_company_ids)s
+                                   ) AS conversion
+                            WINDOW company_window AS (PARTITION BY conversion.company_id ORDER BY conversion.date_from)
+                           ) AS rate_change
+                   ) AS island
+          GROUP BY island.company_id, island.range_number, island.conversion_rate
+            """,
+            target_rate=target_rate,
+            main_company_id=main_company.id,
+            date_to=date_to,
+            other_company_ids=tuple(other_companies.ids),
+        )
+
+    def _get_sql_table_builder_average(self, period_key, main_company, other_companies, date_from, date_to) -> SQL:
+        """
+        Time-weighted average of the conversion rate over the period: every
+        company rate is weighted by the number of days until the next one
+        (or until `date_to` for the last one).
+        """
+        if not other_companies:
+            return self._get_empty_table_builder()
+
+        target_rate = self._get_rate_lookup_sql(
+            self.env.context["custom_currency_id"],
+            main_company.root_id.id,
+            SQL("rate.name"),
+        )
+
+        # Whole closed months are read from the snapshots, the live average
+        # is only computed for companies without one.
+        use_snapshots = self._is_snapshot_month(date_from, date_to)
+        snapshot_condition = SQL("TRUE")
+        if use_snapshots:
+            snapshot_match = SQL(
+                """
+                    snapshot.main_company_id = %(main_company_id)s
+                AND snapshot.target_currency_id = %(target_currency_id)s
+                AND snapshot.date = %(date)s
+                AND snapshot.rate_type = 'average'
+                """,
+                main_company_id=main_company.id,
+                target_currency_id=self.env.context["custom_currency_id"],
+                date=fields.Date.to_date(date_to),
+            )
+            snapshot_condition = SQL(
+                """
+                NOT EXISTS (
+                    SELECT 1 FROM res_currency_rate_snapshot snapshot
+                     WHERE %(snapshot_match)s
+                       AND snapshot.company_id = other_company.id
                 )
+                """,
+                snapshot_match=snapshot_match,
             )
 
-        if not rows:
-            return SQL("SELECT 1 WHERE false")
+        live_query = SQL(
+            """
+            SELECT segment.company_id,
+                   %(period_key)s,
+                   CAST(NULL AS DATE),
+                   CAST(NULL AS DATE),
+                   'average',
+                   COALESCE(
+                       SUM(segment.number_of_days * segment.conversion_rate) / NULLIF(SUM(segment.number_of_days), 0),
+                       1
+                   )
+              FROM (
+                    SELECT other_company.id AS company_id,
+                           COALESCE(
+                               LEAD(rate.name) OVER (PARTITION BY other_company.id ORDER BY rate.name),
+                               %(date_to)s::DATE
+                           ) - rate.name AS number_of_days,
+                           %(target_rate)s / rate.rate AS conversion_rate
+                      FROM res_company other_company
+                      JOIN res_currency_rate rate
+                        ON rate.currency_id = other_company.currency_id
+                       AND rate.company_id = %(main_company_id)s
+                       AND %(date_from_condition)s
+                       AND rate.name <= %(date_to)s
+                     WHERE other_company.id IN %(other_company_ids)s
+                       AND %(snapshot_condition)s
+                   ) AS segment
+          GROUP BY segment.company_id
+            """,
+            period_key=period_key,
+            target_rate=target_rate,
+            main_company_id=main_company.id,
+            date_from_condition=SQL("rate.name >= %s", date_from) if date_from else SQL("TRUE"),
+            date_to=date_to,
+            other_company_ids=tuple(other_companies.ids),
+            snapshot_condition=snapshot_condition,
+        )
+        if not use_snapshots:
+            return live_query
 
         return SQL(
             """
-            SELECT *
-            FROM (VALUES
-                      %(values)s) AS t(company_id, period_key, date_from, date_next, rate_type, rate)
+            SELECT snapshot.company_id,
+                   %(period_key)s,
+                   CAST(NULL AS DATE),
+                   CAST(NULL AS DATE),
+                   'average',
+                   snapshot.rate
+              FROM res_currency_rate_snapshot snapshot
+             WHERE %(snapshot_match)s
+               AND snapshot.company_id IN %(other_company_ids)s
+             UNION ALL
+            (%(live_query)s)
             """,
-            values=SQL(", ").join(rows),
+            period_key=period_key,
+            snapshot_match=snapshot_match,
+            other_company_ids=tuple(other_companies.ids),
+            live_query=live_query,
         )
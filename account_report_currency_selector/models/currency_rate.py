@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = "res.currency.rate"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rates = super().create(vals_list)
+        rates._invalidate_currency_selector_caches(rates._get_rate_dates_by_currency())
+        return rates
+
+    def write(self, vals):
+        rate_dates = self._get_rate_dates_by_currency()
+        res = super().write(vals)
+        for currency_id, dates in self._get_rate_dates_by_currency().items():
+            rate_dates.setdefault(currency_id, []).extend(dates)
+        self._invalidate_currency_selector_caches(rate_dates)
+        return res
+
+    def unlink(self):
+        rate_dates = self._get_rate_dates_by_currency()
+        res = super().unlink()
+        self._invalidate_currency_selector_caches(rate_dates)
+        return res
+
+    def _get_rate_dates_by_currency(self):
+        rate_dates = {}
+        for rate in self:
+            rate_dates.setdefault(rate.currency_id.id, []).append(rate.name)
+        return rate_dates
+
+    def _invalidate_currency_selector_caches(self, rate_dates):
+        self.env["res.currency"]._invalidate_rate_cache()
+        self.env["account.report.currency.table"]._invalidate()
+        for currency_id, dates in rate_dates.items():
+            self.env["res.currency.rate.snapshot"]._invalidate_rates(currency_id, min(dates), max(dates))
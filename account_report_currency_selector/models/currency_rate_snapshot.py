@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api
+from odoo.tools import date_utils, SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class ResCurrencyRateSnapshot(models.Model):
+    """
+    Month-end conversion rates materialized for closed months.
+
+    For every (main company, company, target currency, month end) the
+    closing rate (conversion at the month end) and the average rate over the
+    month are stored, as the set-based currency table builders would compute
+    them. Builders read these rows first and only derive the rate from
+    `res_currency_rate` when no snapshot exists.
+    """
+    _name = "res.currency.rate.snapshot"
+    _description = "Month-End Conversion Rate Snapshot"
+    _log_access = False
+
+    main_company_id = fields.Many2one("res.company", required=True, ondelete="cascade")
+    company_id = fields.Many2one("res.company", required=True, ondelete="cascade")
+    target_currency_id = fields.Many2one("res.currency", required=True, ondelete="cascade")
+    date = fields.Date(required=True)
+    rate_type = fields.Selection(
+        [("closing", "Closing"), ("average", "Average")], required=True
+    )
+    rate = fields.Float(digits=0)
+
+    _sql_constraints = [
+        ("snapshot_uniq",
+         "UNIQUE(main_company_id, company_id, target_currency_id, date, rate_type)",
+         "Only one snapshot per company, target currency, date and rate type is allowed."),
+    ]
+
+    @api.model
+    def _get_snapshot_currencies(self):
+        """
+        Target currencies to materialize: the comma-separated currency codes
+        of the 'account_report_currency_selector.snapshot_currencies'
+        parameter if set, otherwise every active currency that is the
+        currency of a company or has rates.
+        """
+        currency_names = self.env["ir.config_parameter"].sudo().get_param(
+            "account_report_currency_selector.snapshot_currencies", ""
+        )
+        names = [name.strip() for name in currency_names.split(",") if name.strip()]
+        if names:
+            return self.env["res.currency"].with_context(active_test=False).search([("name", "in", names)])
+        rate_currency_ids = [
+            currency_id
+            for currency_id, in self.env.execute_query(SQL("SELECT DISTINCT currency_id FROM res_currency_rate"))
+        ]
+        return self.env["res.currency"].search([
+            "|",
+            ("id", "in", self.env["res.company"].sudo().search([]).currency_id.ids),
+            ("id", "in", rate_currency_ids),
+        ])
+
+    @api.model
+    def _cron_refresh_snapshots(self):
+        """ Materialize the missing snapshots of every closed month. """
+        target_currencies = self._get_snapshot_currencies()
+        if not target_currencies:
+            return
+
+        last_closed_month_end = date_utils.start_of(fields.Date.today(), "month") - relativedelta(days=1)
+        for main_company in self.env["res.company"].search([("parent_id", "=", False)]):
+            companies = self.env["res.company"].search([("id", "child_of", main_company.id)])
+            first_rate = self.env["res.currency.rate"].search(
+                self.env["res.currency.rate"]._check_company_domain(main_company), order="name ASC", limit=1)
+            if not first_rate:
+                continue
+
+            for target_currency in target_currencies:
+                other_companies = companies.filtered(lambda company: company.currency_id != target_currency)
+                if not other_companies:
+                    continue
+                # Checked per company: one added to the group later still gets its past months
+                existing_company_dates = {
+                    (snapshot.company_id.id, snapshot.date)
+                    for snapshot in self.search([
+                        ("main_company_id", "=", main_company.id),
+                        ("target_currency_id", "=", target_currency.id),
+                    ])
+                }
+
+                month_end = date_utils.end_of(first_rate.name, "month")
+                while month_end <= last_closed_month_end:
+                    missing_companies = other_companies.filtered(
+                        lambda company: (company.id, month_end) not in existing_company_dates
+                    )
+                    if missing_companies:
+                        self._materialize_month(main_company, missing_companies, target_currency, month_end)
+                    month_end = date_utils.end_of(month_end + relativedelta(days=1), "month")
+
+    @api.model
+    def _materialize_month(self, main_company, other_companies, target_currency, month_end):
+        currency_model = self.env["res.currency"].with_context(
+            custom_currency_id=target_currency.id,
+            skip_rate_snapshots=True,
+        )
+        build_query = SQL(" UNION ALL ").join([
+            SQL("(%s)", currency_model._get_sql_table_builder_current(
+                None, main_company, other_companies, month_end
+            )),
+            SQL("(%s)", currency_model._get_sql_table_builder_average(
+                None, main_company, other_companies, date_utils.start_of(month_end, "month"), month_end
+            )),
+        ])
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO res_currency_rate_snapshot
+                   (main_company_id, company_id, target_currency_id, date, rate_type, rate)
+            SELECT %(main_company_id)s,
+                   snapshot.company_id,
+                   %(target_currency_id)s,
+                   %(date)s,
+                   CASE WHEN snapshot.rate_type = 'current' THEN 'closing' ELSE snapshot.rate_type END,
+                   snapshot.rate
+              FROM (%(build_query)s) AS snapshot(company_id, period_key, date_from, date_next, rate_type, rate)
+                ON CONFLICT DO NOTHING
+            """,
+            main_company_id=main_company.id,
+            target_currency_id=target_currency.id,
+            date=month_end,
+            build_query=build_query,
+        ))
+        _logger.debug(
+            "Materialized %s conversion rates of %s for %s",
+            target_currency.name, month_end, main_company.name,
+        )
+
+    @api.model
+    def _invalidate_rates(self, currency_id, date_from, date_to):
+        """
+        Drop the snapshots that rates of `currency_id` dated between
+        `date_from` and `date_to` can affect: every month end from the month
+        of `date_from` until the month of the next rate after `date_to`. The
+        cron materializes them again.
+        """
+        next_rate = self.env["res.currency.rate"].search([
+            ("currency_id", "=", currency_id),
+            ("name", ">", date_to),
+        ], order="name ASC", limit=1)
+        self.env.cr.execute(SQL(
+            """
+            DELETE FROM res_currency_rate_snapshot snapshot
+             USING res_company company
+             WHERE company.id = snapshot.company_id
+               AND (snapshot.target_currency_id = %(currency_id)s OR company.currency_id = %(currency_id)s)
+               AND snapshot.date >= %(date_from)s
+               AND %(date_to_condition)s
+            """,
+            currency_id=currency_id,
+            date_from=date_utils.start_of(fields.Date.to_date(date_from), "month"),
+            date_to_condition=(
+                SQL("snapshot.date <= %s", date_utils.end_of(next_rate.name, "month"))
+                if next_rate else SQL("TRUE")
+            ),
+        ))
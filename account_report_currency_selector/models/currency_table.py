@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index, create_unique_index, index_exists
+
+
+class AccountReportCurrencyTable(models.Model):
+    """
+    Persisted copy of `account_currency_table` for forced-currency reports.
+
+    Rows are grouped by `cache_key`, a hash of everything the currency table
+    depends on except its periods, by target currency (several targets are
+    built at once when a report shows currencies side by side) and by
+    `period_signature`, so changing the report dates only builds the new
+    periods. Unfolding, paging or exporting a report reuses the rows built
+    by the first RPC instead of recreating a temporary table. Several period
+    sets are kept per key, so users viewing other dates don't evict each
+    other; rows older than a day are dropped by the autovacuum, and the
+    whole cache as soon as a currency rate changes.
+    """
+    _name = "account.report.currency.table"
+    _description = "Report Currency Table Cache"
+    _log_access = False
+
+    cache_key = fields.Char(required=True, index=True)
+    target_currency_id = fields.Many2one("res.currency", ondelete="cascade")
+    period_signature = fields.Char(required=True)
+    company_id = fields.Many2one("res.company", ondelete="cascade")
+    period_key = fields.Char()
+    date_from = fields.Date()
+    date_next = fields.Date()
+    rate_type = fields.Char()
+    rate = fields.Float(digits=0)
+    build_date = fields.Datetime()
+
+    def init(self):
+        create_index(
+            self.env.cr,
+            "account_report_currency_table_period_index",
+            self._table,
+            ["cache_key", "target_currency_id", "period_signature", "company_id", "rate_type", "date_from",
+             "date_next"],
+        )
+        # One row per company, rate type and date within a period; concurrent
+        # fills of the same periods can't duplicate rows (see `_fill`)
+        if not index_exists(self.env.cr, "account_report_currency_table_row_uniq"):
+            # Only a cache, drop rows that may have been duplicated before
+            self.env.cr.execute(SQL("DELETE FROM account_report_currency_table"))
+        create_unique_index(
+            self.env.cr,
+            "account_report_currency_table_row_uniq",
+            self._table,
+            ["cache_key", "target_currency_id", "period_signature", "company_id",
+             "COALESCE(rate_type, '')", "COALESCE(date_from, '0001-01-01'::date)"],
+        )
+
+    @api.model
+    def _lock(self, cache_key):
+        """ Serialize the requests building or pruning the rows of `cache_key`. """
+        self.env.cr.execute(SQL("SELECT pg_advisory_xact_lock(hashtext(%s))", cache_key))
+
+    @api.model
+    def _get_period_signatures(self, cache_key):
+        """ Signatures of the periods (and shared rows) already stored under `cache_key`. """
+        return {
+            period_signature
+            for period_signature, in self.env.execute_query(SQL(
+                "SELECT DISTINCT period_signature FROM account_report_currency_table WHERE cache_key = %s",
+                cache_key,
+            ))
+        }
+
+    @api.model
+    def _fill(self, cache_key, build_queries):
+        """
+        Store under `cache_key` the rows of every currency table build query
+        of `build_queries`, a list of (target_currency_id, period_signature,
+        query). Callers hold the `_lock` of `cache_key`.
+
+        The lock alone doesn't prevent duplicates: a request waiting on it
+        still reads the signatures of its own snapshot, from before the
+        holder committed. Rows already stored are skipped by the unique
+        index; when they were committed after our snapshot, PostgreSQL raises
+        a serialization failure and the RPC is retried with fresh data.
+        """
+        if not build_queries:
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO account_report_currency_table
+                   (cache_key, target_currency_id, period_signature, company_id, period_key,
+                    date_from, date_next, rate_type, rate, build_date)
+            SELECT %(cache_key)s,
+                   currency_table.target_currency_id,
+                   currency_table.period_signature,
+                   currency_table.company_id,
+                   currency_table.period_key,
+                   currency_table.date_from,
+                   currency_table.date_next,
+                   currency_table.rate_type,
+                   currency_table.rate,
+                   NOW() AT TIME ZONE 'UTC'
+              FROM (%(currency_table_build_query)s)
+                AS currency_table(target_currency_id, period_signature, company_id, period_key,
+                                  date_from, date_next, rate_type, rate)
+                ON CONFLICT DO NOTHING
+            """,
+            cache_key=cache_key,
+            currency_table_build_query=SQL(" UNION ALL ").join(
+                SQL(
+                    """
+                    (SELECT %(target_currency_id)s, %(period_signature)s::VARCHAR, target_table.*
+                       FROM (%(build_query)s) AS target_table)
+                    """,
+                    target_currency_id=target_currency_id,
+                    period_signature=period_signature,
+                    build_query=build_query,
+                )
+                for target_currency_id, period_signature, build_query in build_queries
+            ),
+        ))
+
+    @api.model
+    def _get_table_sql(self, cache_key, target_currency_id, period_signatures) -> SQL:
+        """
+        Cached rows of `cache_key` converting into `target_currency_id` for
+        the given periods, aliased as the regular currency table.
+        """
+        return SQL(
+            """
+            (SELECT company_id, period_key, date_from, date_next, rate_type, rate
+               FROM account_report_currency_table
+              WHERE cache_key = %(cache_key)s
+                AND target_currency_id = %(target_currency_id)s
+                AND period_signature IN %(period_signatures)s) AS account_currency_table
+            """,
+            cache_key=cache_key,
+            target_currency_id=target_currency_id,
+            period_signatures=tuple(period_signatures),
+        )
+
+    @api.model
+    def _invalidate(self):
+        self.env.cr.execute(SQL("DELETE FROM account_report_currency_table"))
+
+    @api.autovacuum
+    def _gc_currency_tables(self):
+        self.env.cr.execute(SQL(
+            """
+            DELETE FROM account_report_currency_table
+             WHERE build_date < NOW() AT TIME ZONE 'UTC' - INTERVAL '1 day'
+            """
+        ))
@@ -5,29 +5,41 @@ import { patch } from "@web/core/utils/patch";
 
 console.log("AccountReportController (base class) currency patch loaded!");
 
+// Fetched once per page session; the browser revalidates it with its ETag.
+let availableCurrenciesPromise = null;
+
+function loadAvailableCurrencies() {
+  if (!availableCurrenciesPromise) {
+    availableCurrenciesPromise = fetch("/account_report_currency_selector/currencies", {
+      credentials: "same-origin",
+    }).then((response) => response.json()).catch((error) => {
+      availableCurrenciesPromise = null;
+      throw error;
+    });
+  }
+  return availableCurrenciesPromise;
+}
+
 patch(AccountReportController.prototype, {
   async load(env) {
-    console.log("Patched AccountReportController.load() starting...");
-    await super.load(env);
-    console.log("Original load() finished. Now loading currencies.");
-
-    const currencies = await this.orm.searchRead(
-      "res.currency",
-      [["active", "=", true]],
-      ["id", "name"]
-    );
-    this.data.available_currencies = currencies;
-    console.log("Loaded active currencies:", this.data.available_currencies);
+    const [currencies] = await Promise.all([loadAvailableCurrencies(), super.load(env)]);
+    this.availableCurrencies = currencies;
   },
 });
 
 import { AccountReportFilters } from "@account_reports/components/account_report/filters/filters";
 
 patch(AccountReportFilters.prototype, {
+  get selectedCurrency() {
+    return (this.controller.availableCurrencies || []).find(
+      (c) => c.id === this.controller.options.custom_currency_id
+    );
+  },
+
   async onCustomButtonClick(currencyId) {
     if (currencyId) {
       console.log("A currency was selected:", currencyId);
-      const currency = this.controller.options.available_currencies.find(
+      const currency = (this.controller.availableCurrencies || []).find(
         (c) => c.id === currencyId
       );
       console.log("Selected currency object:", currency);
@@ -40,4 +52,27 @@ patch(AccountReportFilters.prototype, {
       console.log("The main 'My Button' was clicked.");
     }
   },
+
+  isCurrencyCompared(currencyId) {
+    return (this.controller.options.custom_currency_ids || []).includes(currencyId);
+  },
+
+  async onCompareCurrencyClick(currencyId) {
+    const options = this.controller.options;
+    let currencyIds = [...(options.custom_currency_ids || [options.custom_currency_id])];
+    if (currencyIds.includes(currencyId)) {
+      // The main selected currency always stays in the report
+      if (currencyId === options.custom_currency_id) {
+        return;
+      }
+      currencyIds = currencyIds.filter((id) => id !== currencyId);
+    } else {
+      currencyIds.push(currencyId);
+    }
+    await this.filterClicked({
+      optionKey: "custom_currency_ids",
+      optionValue: currencyIds,
+      reload: true,
+    });
+  },
 });
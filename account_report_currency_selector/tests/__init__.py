@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from . import test_benchmark_currency_selector
+from . import test_benchmark_average_rates
+from . import test_benchmark_cell_formatting
+from . import test_currency_table_builders
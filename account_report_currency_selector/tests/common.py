@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from odoo import Command, fields
+from odoo.tools import SQL
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_CURRENCIES = ["EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "INR", "SEK", "NOK", "DKK"]
+
+
+def get_benchmark_scale(name, default):
+    """ Benchmark volumes, overridable with CURRENCY_SELECTOR_BENCHMARK_<NAME> environment variables. """
+    return int(os.environ.get(f"CURRENCY_SELECTOR_BENCHMARK_{name.upper()}", default))
+
+
+class CurrencySelectorBenchmarkCommon(AccountTestInvoicingCommon):
+    """
+    Synthetic multi-company, multi-currency data for the currency selector
+    benchmarks: companies in rotating currencies, daily rates of every
+    currency over several years and posted move lines in each company.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.currencies = cls.env["res.currency"].with_context(active_test=False).search([
+            ("name", "in", BENCHMARK_CURRENCIES),
+        ])
+        cls.currencies.active = True
+
+    @classmethod
+    def _generate_companies(cls, count, with_accounting=True):
+        """ Create `count` companies, each in the next currency of `currencies`. """
+        companies = cls.env["res.company"]
+        for index in range(count):
+            currency = cls.currencies[index % len(cls.currencies)]
+            if with_accounting:
+                companies |= cls.setup_other_company(
+                    name=f"Benchmark Company {index}", currency_id=currency.id,
+                )["company"]
+            else:
+                companies |= cls.env["res.company"].create({
+                    "name": f"Benchmark Company {index}",
+                    "currency_id": currency.id,
+                })
+        return companies
+
+    @classmethod
+    def _generate_daily_rates(cls, currencies, company, date_from, date_to):
+        """ One rate per day and currency between `date_from` and `date_to`, inserted in bulk. """
+        cls.env["res.currency.rate"].flush_model()
+        cls.env.cr.execute(SQL(
+            """
+            INSERT INTO res_currency_rate (name, rate, currency_id, company_id, create_date, write_date)
+            SELECT day::date,
+                   0.5 + random(),
+                   currency.id,
+                   %(company_id)s,
+                   NOW() AT TIME ZONE 'UTC',
+                   NOW() AT TIME ZONE 'UTC'
+              FROM generate_series(%(date_from)s::date, %(date_to)s::date, INTERVAL '1 day') AS day,
+                   unnest(%(currency_ids)s) AS currency(id)
+                ON CONFLICT DO NOTHING
+            """,
+            company_id=company.id,
+            date_from=date_from,
+            date_to=date_to,
+            currency_ids=currencies.ids,
+        ))
+        cls._invalidate_currency_caches()
+
+    @classmethod
+    def _invalidate_currency_caches(cls):
+        cls.env["res.currency"]._invalidate_rate_cache()
+        cls.env["account.report.currency.table"]._invalidate()
+        cls.env.invalidate_all()
+
+    @classmethod
+    def _generate_move_lines(cls, company, move_count, date_from, date_to):
+        """ Post `move_count` two-line miscellaneous entries spread over the period. """
+        company_data = cls.collect_company_accounting_data(company)
+        span = (date_to - date_from).days + 1
+        moves = cls.env["account.move"].with_company(company).create([
+            {
+                "move_type": "entry",
+                "date": fields.Date.add(date_from, days=index % span),
+                "journal_id": company_data["default_journal_misc"].id,
+                "line_ids": [
+                    Command.create({
+                        "account_id": company_data["default_account_revenue"].id,
+                        "balance": -(index % 997 + 1.0),
+                    }),
+                    Command.create({
+                        "account_id": company_data["default_account_expense"].id,
+                        "balance": index % 997 + 1.0,
+                    }),
+                ],
+            }
+            for index in range(move_count)
+        ])
+        moves.action_post()
+        return moves
+
+    @contextmanager
+    def _measure(self, measures, stage, **labels):
+        """ Append the wall time and query count of the wrapped block to `measures`. """
+        query_count = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        yield
+        measures.append({
+            **labels,
+            "stage": stage,
+            "duration": time.perf_counter() - start,
+            "query_count": self.env.cr.sql_log_count - query_count,
+        })
+
+    def _log_measures(self, title, measures):
+        _logger.info("%s", title)
+        for measure in measures:
+            _logger.info(
+                "  %s",
+                ", ".join(
+                    f"{key}: {value:.3f}s" if key == "duration" else f"{key}: {value}"
+                    for key, value in measure.items()
+                ),
+            )
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests import tagged
+
+from .common import CurrencySelectorBenchmarkCommon, get_benchmark_scale
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class TestBenchmarkAverageRates(CurrencySelectorBenchmarkCommon):
+    """
+    Throughput of the average rate builder, in both builder modes, over
+    daily rates for many companies (10 years and 50 companies by default,
+    see CURRENCY_SELECTOR_BENCHMARK_AVERAGE_YEARS and _AVERAGE_COMPANIES).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.years = get_benchmark_scale("average_years", 10)
+        cls.company_count = get_benchmark_scale("average_companies", 50)
+
+        cls.date_to = date(2025, 12, 31)
+        cls.date_from = date(cls.date_to.year - cls.years + 1, 1, 1)
+
+        cls.main_company = cls.env.company
+        cls.other_companies = cls._generate_companies(cls.company_count, with_accounting=False)
+        cls.target_currency = cls.currencies.filtered(lambda c: c != cls.main_company.currency_id)[0]
+        cls._generate_daily_rates(
+            cls.currencies | cls.main_company.currency_id, cls.main_company, cls.date_from, cls.date_to,
+        )
+        cls.rate_count = cls.env["res.currency.rate"].search_count([
+            ("company_id", "=", cls.main_company.id),
+            ("currency_id", "in", cls.other_companies.currency_id.ids),
+            ("name", ">=", cls.date_from),
+            ("name", "<=", cls.date_to),
+        ])
+
+    def _run_average_builders(self, builder_mode):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_report_currency_selector.table_builder_mode", builder_mode,
+        )
+        self._invalidate_currency_caches()
+        Currency = self.env["res.currency"].with_context(custom_currency_id=self.target_currency.id)
+        for year in range(self.date_from.year, self.date_to.year + 1):
+            builder = Currency._get_table_builder_average(
+                str(year), self.main_company, self.other_companies,
+                date(year, 1, 1), date(year, 12, 31), 1.0,
+            )
+            rows = self.env.execute_query(builder)
+            self.assertTrue(rows)
+
+    def test_benchmark_average_rates(self):
+        measures = []
+        for builder_mode in ("python", "sql"):
+            with self._measure(measures, "average_builder", mode=builder_mode):
+                self._run_average_builders(builder_mode)
+        for measure in measures:
+            measure["rates_per_second"] = round(self.rate_count / measure["duration"]) if measure["duration"] else 0
+
+        self._log_measures(
+            f"Average rate benchmark: {self.company_count} companies, {self.years} years of daily rates "
+            f"({self.rate_count} rates)",
+            measures,
+        )
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from .common import CurrencySelectorBenchmarkCommon, get_benchmark_scale
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class TestBenchmarkCellFormatting(CurrencySelectorBenchmarkCommon):
+    """
+    Cost of formatting monetary cells in a custom currency compared to the
+    company currency, for 100k cells by default (see
+    CURRENCY_SELECTOR_BENCHMARK_CELLS).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cell_count = get_benchmark_scale("cells", 100000)
+        cls.report = cls.env.ref("account_reports.balance_sheet")
+        cls.target_currency = cls.currencies.filtered(lambda c: c != cls.env.company.currency_id)[0]
+
+    def test_benchmark_cell_formatting(self):
+        measures = []
+        for currency in self.env.company.currency_id | self.target_currency:
+            options = self.report.get_options({"custom_currency_id": currency.id})
+            with self._measure(measures, "format_value", currency=currency.name, cells=self.cell_count):
+                for index in range(self.cell_count):
+                    self.report._format_value(options, index * 1.37, "monetary")
+            self.assertIn(
+                currency.symbol,
+                self.report._format_value(options, 1234.5, "monetary", format_params={"currency_id": currency.id}),
+            )
+
+        self._log_measures("Monetary cell formatting benchmark", measures)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests import tagged
+
+from .common import CurrencySelectorBenchmarkCommon, get_benchmark_scale
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class TestBenchmarkCurrencySelector(CurrencySelectorBenchmarkCommon):
+    """
+    Cost of the currency selector on top of the stock reports: every stage
+    of a report request is timed, with query counts, in the company
+    currency and in each custom currency.
+
+    Run with --test-tags benchmark; volumes are set through the
+    CURRENCY_SELECTOR_BENCHMARK_COMPANIES, _MOVES and _YEARS environment
+    variables.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company_count = get_benchmark_scale("companies", 3)
+        cls.move_count = get_benchmark_scale("moves", 500)
+        cls.years = get_benchmark_scale("years", 2)
+
+        cls.date_to = date(2025, 12, 31)
+        cls.date_from = date(cls.date_to.year - cls.years + 1, 1, 1)
+
+        cls.main_company = cls.env.company
+        cls.companies = cls.main_company | cls._generate_companies(cls.company_count)
+        cls._generate_daily_rates(
+            cls.currencies | cls.companies.currency_id, cls.main_company, cls.date_from, cls.date_to,
+        )
+        for company in cls.companies:
+            cls._generate_move_lines(company, cls.move_count, cls.date_from, cls.date_to)
+        cls.env["account.move.line"].flush_model()
+
+    def _benchmark_report(self, report):
+        report = report.with_context(allowed_company_ids=self.companies.ids)
+        target_currencies = self.currencies.filtered(lambda c: c != self.main_company.currency_id)[:2]
+        measures = []
+        for currency in self.main_company.currency_id | target_currencies:
+            self._invalidate_currency_caches()
+            labels = {"report": report.name, "currency": currency.name}
+            previous_options = {
+                "custom_currency_id": currency.id,
+                "date": {
+                    "date_from": self.date_from.isoformat(),
+                    "date_to": self.date_to.isoformat(),
+                    "mode": "range",
+                    "filter": "custom",
+                },
+            }
+            with self._measure(measures, "get_options", **labels):
+                options = report.get_options(previous_options)
+            with self._measure(measures, "init_currency_table", **labels):
+                report._init_currency_table(options)
+            with self._measure(measures, "get_lines", **labels):
+                lines = report._get_lines(options)
+            with self._measure(measures, "export_to_xlsx", **labels):
+                report.export_to_xlsx(options)
+            self.assertTrue(lines)
+
+        self._log_measures(
+            f"Currency selector benchmark: {len(self.companies)} companies, "
+            f"{self.move_count} moves per company, {self.years} years of daily rates",
+            measures,
+        )
+        return measures
+
+    def test_benchmark_balance_sheet(self):
+        self._benchmark_report(self.env.ref("account_reports.balance_sheet"))
+
+    def test_benchmark_general_ledger(self):
+        self._benchmark_report(self.env.ref("account_reports.general_ledger_report"))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged("post_install", "-at_install")
+class TestCurrencyTableBuilders(AccountTestInvoicingCommon):
+    """
+    The set-based ('sql') and Python ('python') builders of the forced
+    currency table must produce the same rows.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.main_company = cls.env.company
+        currencies = cls.env["res.currency"].with_context(active_test=False).search([
+            ("name", "in", ("EUR", "GBP", "CHF", "JPY")),
+            ("id", "!=", cls.main_company.currency_id.id),
+        ], order="name")
+        currencies.active = True
+        cls.target_currency, *company_currencies = currencies[:3]
+        cls.other_companies = cls.env["res.company"].create([
+            {"name": f"Builder Company {currency.name}", "currency_id": currency.id}
+            for currency in company_currencies
+        ])
+        cls.companies = cls.main_company | cls.other_companies
+        rising_currency, stale_currency = company_currencies
+
+        Rate = cls.env["res.currency.rate"].sudo()
+        Rate.search([("currency_id", "in", (currencies | cls.main_company.currency_id).ids)]).unlink()
+        # Historical and average rates read the main company's rates, current
+        # and closing rates the other companies' own, here the shared ones
+        Rate.create([
+            {"name": date(2023, 2, 1), "rate": rate, "currency_id": currency.id, "company_id": False}
+            for currency, rate in ((rising_currency, 0.85), (stale_currency, 0.6))
+        ])
+        Rate.create([
+            {"name": rate_date, "rate": rate, "currency_id": currency.id, "company_id": cls.main_company.id}
+            for currency, rates in (
+                (cls.target_currency, [
+                    (date(2022, 12, 1), 1.1),
+                    (date(2023, 4, 1), 1.2),
+                ]),
+                # Equal consecutive conversion rates and no main company rate in February
+                (rising_currency, [
+                    (date(2023, 1, 1), 0.8),
+                    (date(2023, 1, 15), 0.8),
+                    (date(2023, 3, 1), 0.9),
+                    (date(2023, 6, 20), 1.0),
+                ]),
+                # No rate after 2022: the company has no average rate in 2023
+                (stale_currency, [
+                    (date(2022, 6, 1), 0.7),
+                    (date(2022, 11, 1), 0.75),
+                ]),
+            )
+            for rate_date, rate in rates
+        ])
+
+        cls.date_periods = [
+            # Open-ended period first, then consecutive quarters
+            ("before", None, date(2022, 12, 31)),
+            ("q1", date(2023, 1, 1), date(2023, 3, 31)),
+            ("q2", date(2023, 4, 1), date(2023, 6, 30)),
+        ]
+
+    def _get_rows(self, builder_mode, use_cta_rates):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_report_currency_selector.table_builder_mode", builder_mode,
+        )
+        self.env["res.currency"]._invalidate_rate_cache()
+        shared_query, period_queries = self.env["res.currency"].with_context(
+            custom_currency_id=self.target_currency.id,
+            skip_rate_snapshots=True,
+        )._get_currency_table_build_queries(self.companies, self.date_periods, use_cta_rates=use_cta_rates)
+
+        rows = []
+        for query in filter(None, [shared_query, *period_queries.values()]):
+            rows += self.env.execute_query(query)
+        return sorted(rows, key=lambda row: tuple(str(value) for value in row[:5]))
+
+    def _assert_same_rows(self, use_cta_rates):
+        sql_rows = self._get_rows("sql", use_cta_rates)
+        python_rows = self._get_rows("python", use_cta_rates)
+        self.assertTrue(sql_rows)
+        self.assertEqual(
+            [tuple(row[:5]) for row in sql_rows],
+            [tuple(row[:5]) for row in python_rows],
+        )
+        for sql_row, python_row in zip(sql_rows, python_rows):
+            self.assertAlmostEqual(float(sql_row[5]), float(python_row[5]), places=6, msg=sql_row[:5])
+
+    def test_current_rates(self):
+        self._assert_same_rows(use_cta_rates=False)
+
+    def test_closing_historical_average_rates(self):
+        self._assert_same_rows(use_cta_rates=True)
+        rate_types = {row[4] for row in self._get_rows("sql", use_cta_rates=True)}
+        self.assertTrue({"closing", "historical", "average"} <= rate_types)
@@ -38,6 +38,8 @@
         'views/hr_department_views.xml',
         'views/account_group_views.xml',
         'views/country_group_analytic_distribution_views.xml',
+        'views/analytic_redistribution_job_views.xml',
+        'data/ir_cron.xml',
     ],
 
     'assets': {
@@ -12,3 +12,5 @@ from . import res_country
 from . import country_group_analytic_distribution
 from . import product_brand
 from . import account_group
+from . import analytic_redistribution_job
+from . import res_company
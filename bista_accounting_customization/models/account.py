@@ -2,11 +2,17 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
-from odoo.tools import SQL, Query
+from odoo.tools import Query
+from odoo.tools.lru import LRU
+from collections import defaultdict
+import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+ANALYTIC_DISTRIBUTION_CACHE_KEY = 'bista_accounting_customization.analytic_distributions'
+ANALYTIC_DISTRIBUTION_CACHE_SIZE = 4096
+
 
 class AccountAccount(models.Model):
     _inherit = 'account.account'
@@ -23,55 +29,10 @@ class AccountAccount(models.Model):
         if not accounts_with_code:
             return
 
-        codes = accounts_with_code.mapped('code')
         root_company_id = self.env.company.root_id.id
-
-        # Step 1: Find explicit matches
-        explicit_groups = self.env['account.group'].search([
-            ('company_id', '=', root_company_id),
-            ('explicit_account_codes', '!=', False),
-        ])
-
-        explicit_match = {}
-        for group in explicit_groups:
-            group_codes = [
-                code.strip()
-                for code in group.explicit_account_codes.split(',')
-                if code.strip()
-            ]
-            for code in codes:
-                if code in group_codes:
-                    explicit_match[code] = group.id
-
-        # Step 2: For remaining codes, use prefix range matching
-        remaining_codes = [code for code in codes if code not in explicit_match]
-        prefix_match = {}
-
-        if remaining_codes:
-            account_code_values = SQL(','.join(['(%s)'] * len(remaining_codes)), *remaining_codes)
-            results = self.env.execute_query(SQL(
-                """
-                SELECT DISTINCT
-                ON (account_code.code)
-                    account_code.code,
-                    agroup.id AS group_id
-                FROM (VALUES %(account_code_values)s) AS account_code (code)
-                    LEFT JOIN account_group agroup
-                ON agroup.code_prefix_start <= LEFT (account_code.code, char_length (agroup.code_prefix_start))
-                    AND agroup.code_prefix_end >= LEFT (account_code.code, char_length (agroup.code_prefix_end))
-                    AND agroup.company_id = %(root_company_id)s
-                ORDER BY account_code.code, char_length (agroup.code_prefix_start) DESC, agroup.id
-                """,
-                account_code_values=account_code_values,
-                root_company_id=root_company_id,
-            ))
-            prefix_match = dict(results)
-
-        # Step 3: Merge results (explicit takes priority)
-        group_by_code = {**prefix_match, **explicit_match}
-
+        AccountGroup = self.env['account.group']
         for account in accounts_with_code:
-            account.group_id = group_by_code.get(account.code, False)
+            account.group_id = AccountGroup._find_group_id_for_code(root_company_id, account.code)
 
 
 class AccountMoveLine(models.Model):
@@ -87,7 +48,7 @@ class AccountMoveLine(models.Model):
         """
         for line in self:
             try:
-                distributions = line.compute_analytic_distribution(
+                distributions = line._resolve_analytic_distribution(
                     partner=line.partner_id,
                     product=line.product_id,
                     user=self.env.user,
@@ -108,7 +69,8 @@ class AccountMoveLine(models.Model):
         Args:
             partner: res.partner record or False
             product: product.template/product.product record or False
-            user: res.users record or False
+            user: res.users record, or an empty recordset to leave out the
+                department part; defaults to the current user
             raise_on_missing: bool - if True, raises ValidationError when user/department lack distribution
         
         Returns:
@@ -131,7 +93,8 @@ class AccountMoveLine(models.Model):
                 _logger.exception("Failed to read product.analytic_distribution for product %s", product.id)
 
         # 3. User + Department distribution
-        user = user or self.env.user
+        if user is None:
+            user = self.env.user
         department = False
         try:
             department = user.employee_id.department_id if getattr(user, 'employee_id', False) else False
@@ -161,44 +124,95 @@ class AccountMoveLine(models.Model):
 
         return distributions
 
+    @api.model
+    def _resolve_analytic_distribution(self, partner=False, product=False, user=None, raise_on_missing=False):
+        """
+        Memoized `compute_analytic_distribution`, keyed by partner, product,
+        user and company. Entries live in an LRU for the current transaction
+        and are dropped by `_invalidate_analytic_distribution_cache` whenever
+        a source distribution changes. Validating calls (raise_on_missing)
+        always recompute so errors are still raised.
+        """
+        if user is None:
+            user = self.env.user
+        key = (
+            partner.id if partner else False,
+            product.id if product else False,
+            user.id,
+            self.env.company.id,
+        )
+        cache = self.env.cr.cache.get(ANALYTIC_DISTRIBUTION_CACHE_KEY)
+        if cache is None:
+            cache = self.env.cr.cache[ANALYTIC_DISTRIBUTION_CACHE_KEY] = LRU(ANALYTIC_DISTRIBUTION_CACHE_SIZE)
+        if raise_on_missing or key not in cache:
+            cache[key] = self.compute_analytic_distribution(
+                partner=partner,
+                product=product,
+                user=user,
+                raise_on_missing=raise_on_missing,
+            )
+        return dict(cache[key])
+
+    @api.model
+    def _invalidate_analytic_distribution_cache(self):
+        self.env.cr.cache.pop(ANALYTIC_DISTRIBUTION_CACHE_KEY, None)
+
     @api.model_create_multi
     def create(self, vals_list):
         """
         Override create to auto-populate analytic distribution.
-        Uses context flag to prevent recursion.
+        Distributions are resolved for the whole batch and injected into
+        vals_list, so the new lines never need a post-create write.
         """
-        # First create records normally
-        records = super().create(vals_list)
-
         # Skip if context flag is set (prevents infinite recursion)
-        if self.env.context.get('skip_analytic_distribution_create'):
-            return records
+        if not self.env.context.get('skip_analytic_distribution_create'):
+            self._prepare_analytic_distribution_vals(vals_list)
+
+        return super().create(vals_list)
 
-        # After creation, compute distribution for each created record
-        for rec in records:
+    @api.model
+    def _prepare_analytic_distribution_vals(self, vals_list):
+        """
+        Set 'analytic_distribution' in each of `vals_list`, from the partner
+        (given or inherited from the move), product and current user.
+        Partners, products and moves are prefetched for the whole batch.
+        """
+        moves = self.env['account.move'].browse({
+            vals['move_id'] for vals in vals_list if vals.get('move_id')
+        })
+        move_partners = {move.id: move.partner_id.commercial_partner_id.sudo() for move in moves}
+        partners = self.env['res.partner'].sudo().browse({
+            vals['partner_id'] for vals in vals_list if vals.get('partner_id')
+        })
+        products = self.env['product.product'].sudo().browse({
+            vals['product_id'] for vals in vals_list if vals.get('product_id')
+        })
+        all_partners = partners | self.env['res.partner'].sudo().union(*move_partners.values())
+        all_partners._ensure_analytic_accounts()
+        # One read per model instead of one per line
+        all_partners.mapped('analytic_distribution')
+        products.mapped('analytic_distribution')
+
+        for index, vals in enumerate(vals_list):
             try:
-                # Compute using actual record values
-                dist = rec.compute_analytic_distribution(
-                    partner=(rec.partner_id.sudo() if rec.partner_id else False),
-                    product=(rec.product_id.sudo() if rec.product_id else False),
+                if vals.get('partner_id'):
+                    partner = partners.browse(vals['partner_id'])
+                else:
+                    partner = move_partners.get(vals.get('move_id'), False)
+                dist = self._resolve_analytic_distribution(
+                    partner=partner,
+                    product=(products.browse(vals['product_id']) if vals.get('product_id') else False),
                     user=self.env.user,
                     raise_on_missing=False  # shouldn't raise during imports/API calls
                 )
-                
-                # Only write if computed distribution differs from current
-                if dist and dist != (rec.analytic_distribution or {}):
-                    # Use context flag to prevent recursion
-                    rec.with_context(skip_analytic_distribution_write=True).write({
-                        'analytic_distribution': dist
-                    })
+                if dist:
+                    vals['analytic_distribution'] = dist
             except Exception:
                 _logger.exception(
-                    "Error computing analytic_distribution for newly created account.move.line id %s",
-                    rec.id
+                    "Error computing analytic_distribution for new account.move.line at index %s",
+                    index
                 )
 
-        return records
-
     def write(self, vals):
         """
         Override write to recompute analytic distribution when relevant fields change.
@@ -227,25 +241,66 @@ class AccountMoveLine(models.Model):
         if not do_recompute:
             return res
 
-        # Recompute for all records in this recordset
-        for rec in self:
+        self._recompute_analytic_distribution()
+
+        return res
+
+    def _recompute_analytic_distribution(self, use_line_user=False):
+        """
+        Re-derive analytic_distribution for these lines in a set-based way:
+        lines are grouped by their resulting distribution and each group is
+        updated with a single write.
+
+        Args:
+            use_line_user: resolve the department from each line's salesperson
+                instead of the current user (mass re-derivation); lines
+                without a salesperson (bills, payments, misc entries) get
+                their partner and product parts only, never the department
+                of whoever runs the job
+
+        Returns:
+            int: number of lines whose distribution changed
+        """
+        lines_by_distribution = defaultdict(list)
+        distributions = {}
+        self.partner_id._ensure_analytic_accounts()
+        for line in self:
             try:
-                dist = rec.compute_analytic_distribution(
-                    partner=(rec.partner_id.sudo() if rec.partner_id else False),
-                    product=(rec.product_id.sudo() if rec.product_id else False),
-                    user=self.env.user,
+                dist = line._resolve_analytic_distribution(
+                    partner=(line.partner_id.sudo() if line.partner_id else False),
+                    product=(line.product_id.sudo() if line.product_id else False),
+                    user=(line.user_id if use_line_user else self.env.user),
                     raise_on_missing=False
                 )
-                
-                if dist and dist != (rec.analytic_distribution or {}):
-                    # Use context flag to prevent recursion
-                    rec.with_context(skip_analytic_distribution_write=True).write({
-                        'analytic_distribution': dist
-                    })
             except Exception:
                 _logger.exception(
-                    "Error recomputing analytic_distribution for account.move.line id %s during write",
-                    rec.id
+                    "Error recomputing analytic_distribution for account.move.line id %s",
+                    line.id
                 )
-
-        return res
+                continue
+            if dist and dist != (line.analytic_distribution or {}):
+                key = json.dumps(dist, sort_keys=True)
+                distributions[key] = dist
+                lines_by_distribution[key].append(line.id)
+
+        # Use context flag to prevent recursion
+        lines = self.with_context(skip_analytic_distribution_write=True)
+        for key, line_ids in lines_by_distribution.items():
+            lines.browse(line_ids).write({'analytic_distribution': distributions[key]})
+        return sum(len(line_ids) for line_ids in lines_by_distribution.values())
+
+    def action_recompute_analytic_distribution(self):
+        """
+        Server action: re-derive analytics for the selected journal items,
+        e.g. after filtering the list on a date range or journal. Each line
+        is resolved with its own salesperson, not the user running the action.
+        """
+        count = self._recompute_analytic_distribution(use_line_user=True)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'message': _("%s journal items updated.", count),
+            }
+        }
@@ -1,5 +1,48 @@
-from odoo import models, fields, api, _
+from bisect import bisect_right
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists
+
+
+class AccountGroupExplicitCode(models.Model):
+    """
+    Normalized (company, code) -> group rows of `explicit_account_codes`,
+    kept in sync by account.group. The unique index makes an explicit code
+    belong to a single group per company.
+    """
+    _name = 'account.group.explicit.code'
+    _description = 'Account Group Explicit Code'
+    _log_access = False
+
+    group_id = fields.Many2one('account.group', required=True, ondelete='cascade', index=True)
+    company_id = fields.Many2one('res.company', required=True, ondelete='cascade')
+    code = fields.Char(required=True)
+
+    _sql_constraints = [
+        ('company_code_uniq',
+         'UNIQUE(company_id, code)',
+         'Each account code can only be explicitly assigned to one group.'),
+    ]
+
+    def init(self):
+        # Populate from the groups configured before the table existed. On a
+        # fresh install this model is set up before the account.group
+        # extension adds its column, and there is nothing to migrate yet.
+        if not column_exists(self.env.cr, 'account_group', 'explicit_account_codes'):
+            return
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO account_group_explicit_code (group_id, company_id, code)
+            SELECT DISTINCT ON (ag.company_id, TRIM(c.code)) ag.id, ag.company_id, TRIM(c.code)
+              FROM account_group ag,
+                   unnest(string_to_array(ag.explicit_account_codes, ',')) AS c (code)
+             WHERE TRIM(c.code) != ''
+          ORDER BY ag.company_id, TRIM(c.code), ag.id
+                ON CONFLICT DO NOTHING
+            """
+        ))
 
 
 class AccountGroup(models.Model):
@@ -11,19 +54,114 @@ class AccountGroup(models.Model):
              "bypassing prefix range matching. Example: 100100,100200,100300"
     )
 
-    @api.constrains('explicit_account_codes', 'company_id')
-    def _check_explicit_codes_uniqueness(self):
-        for group in self:
-            if not group.explicit_account_codes:
+    @api.model_create_multi
+    def create(self, vals_list):
+        groups = super().create(vals_list)
+        groups.filtered('explicit_account_codes')._sync_explicit_codes()
+        self.env.registry.clear_cache()
+        return groups
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'explicit_account_codes', 'company_id'} & vals.keys():
+            self._sync_explicit_codes()
+        if {'code_prefix_start', 'code_prefix_end', 'explicit_account_codes', 'company_id'} & vals.keys():
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def _get_explicit_codes(self):
+        self.ensure_one()
+        return [code.strip() for code in (self.explicit_account_codes or '').split(',') if code.strip()]
+
+    def _sync_explicit_codes(self):
+        """ Replace the explicit code rows of these groups by their current `explicit_account_codes`. """
+        ExplicitCode = self.env['account.group.explicit.code'].sudo()
+        ExplicitCode.search([('group_id', 'in', self.ids)]).unlink()
+        ExplicitCode.create([
+            {'group_id': group.id, 'company_id': group.company_id.id, 'code': code}
+            for group in self
+            for code in dict.fromkeys(group._get_explicit_codes())
+        ])
+
+    @tools.ormcache('root_company_id')
+    def _get_code_index(self, root_company_id):
+        """
+        Code lookup index of the groups of `root_company_id`, rebuilt only
+        when groups change.
+
+        Returns:
+            tuple: (explicit, lengths, prefixes, ranges) where
+                explicit: {account code: group id}
+                lengths: prefix lengths, longest first
+                prefixes: {length: {prefix: group id}} for single-prefix groups
+                ranges: {length: [(start, end, group id)]} sorted by start, for
+                    groups whose prefix start and end differ
+        """
+        groups = self.sudo().search_read(
+            [('company_id', '=', root_company_id)],
+            ['code_prefix_start', 'code_prefix_end'],
+            order='id',
+        )
+        self.env['account.group.explicit.code'].flush_model()
+        explicit = dict(self.env.execute_query(SQL(
+            "SELECT code, group_id FROM account_group_explicit_code WHERE company_id = %s",
+            root_company_id,
+        )))
+        prefixes = {}
+        ranges = {}
+        for group in groups:
+            start = group['code_prefix_start']
+            end = group['code_prefix_end'] or start
+            if not start:
                 continue
+            if start == end:
+                prefixes.setdefault(len(start), {}).setdefault(start, group['id'])
+            else:
+                ranges.setdefault(len(start), []).append((start, end, group['id']))
+        for length_ranges in ranges.values():
+            length_ranges.sort()
+        lengths = sorted(prefixes.keys() | ranges.keys(), reverse=True)
+        return explicit, lengths, prefixes, ranges
 
-            # Parse and clean codes
-            codes = [
-                code.strip()
-                for code in group.explicit_account_codes.split(',')
-                if code.strip()
-            ]
+    @api.model
+    def _find_group_id_for_code(self, root_company_id, code):
+        """
+        Group of an account `code`: an explicit assignment first, otherwise
+        the group with the longest matching prefix (lowest id on ties).
+        Costs one dict lookup per distinct prefix length, plus a scan of the
+        range groups (prefix start != end) of that length starting at or
+        before the code; those are rare in practice.
+        """
+        explicit, lengths, prefixes, ranges = self._get_code_index(root_company_id)
+        if code in explicit:
+            return explicit[code]
+        for length in lengths:
+            key = code[:length]
+            candidates = []
+            if key in prefixes.get(length, {}):
+                candidates.append(prefixes[length][key])
+            length_ranges = ranges.get(length)
+            if length_ranges:
+                # Ranges starting after the key can't match
+                for start, end, group_id in length_ranges[:bisect_right(length_ranges, (key, chr(0x10ffff)))]:
+                    if end >= code[:len(end)]:
+                        candidates.append(group_id)
+            if candidates:
+                return min(candidates)
+        return False
 
+    @api.constrains('explicit_account_codes', 'company_id')
+    def _check_explicit_codes_uniqueness(self):
+        # Rows of these groups are synced after the constraint runs: check
+        # the batch against itself, and the table for the other groups only
+        batch_groups_by_code = {}
+        for group in self:
+            codes = group._get_explicit_codes()
             if not codes:
                 continue
 
@@ -36,24 +174,27 @@ class AccountGroup(models.Model):
                     codes=', '.join(set(duplicates))
                 ))
 
-            # Check for duplicates across other groups in same company
-            other_groups = self.search([
-                ('id', '!=', group.id),
-                ('company_id', '=', group.company_id.id),
-                ('explicit_account_codes', '!=', False),
-            ])
-
-            for other_group in other_groups:
-                other_codes = [
-                    code.strip()
-                    for code in other_group.explicit_account_codes.split(',')
-                    if code.strip()
-                ]
-                conflicts = set(codes) & set(other_codes)
-                if conflicts:
+            # Check for duplicates across the groups of this batch
+            for code in codes:
+                other_group = batch_groups_by_code.setdefault((group.company_id.id, code), group)
+                if other_group != group:
                     raise ValidationError(_(
                         "Account code(s) %(codes)s already exist in group '%(other_group)s'. "
                         "Each account code can only be explicitly assigned to one group.",
-                        codes=', '.join(conflicts),
+                        codes=code,
                         other_group=other_group.name
                     ))
+
+            # Check for duplicates across other groups in same company
+            conflicts = self.env['account.group.explicit.code'].sudo().search([
+                ('company_id', '=', group.company_id.id),
+                ('code', 'in', codes),
+                ('group_id', 'not in', self.ids),
+            ])
+            if conflicts:
+                raise ValidationError(_(
+                    "Account code(s) %(codes)s already exist in group '%(other_group)s'. "
+                    "Each account code can only be explicitly assigned to one group.",
+                    codes=', '.join(conflicts.mapped('code')),
+                    other_group=conflicts[0].group_id.name
+                ))
@@ -1,6 +1,17 @@
 # -*- coding: utf-8 -*-
 
-from odoo import fields, models, api
+from odoo import fields, models, api, tools
+
+ELIGIBILITY_FIELDS = (
+    'is_eligible_customer',
+    'is_eligible_product',
+    'is_eligible_prod_brand',
+    'is_eligible_prod_categ',
+    'is_eligible_hr_department',
+    'is_eligible_country',
+    'is_eligible_region',
+    'is_eligible_top_region',
+)
 
 
 class AnalyticAccount(models.Model):
@@ -12,6 +23,47 @@ class AnalyticAccount(models.Model):
         help="Link this analytic account to a specific partner"
     )
 
+    @api.model
+    def _provision_accounts(self, plan, names):
+        """
+        Make sure an analytic account exists under `plan` for each of `names`.
+        Existing accounts are fetched with one query and all missing ones
+        are created with a single create.
+
+        Returns:
+            dict: {name: analytic account id}
+        """
+        names = [name for name in dict.fromkeys(names) if name]
+        if not plan or not names:
+            return {}
+        AnalyticAccount = self.sudo()
+        account_ids = {
+            account['name']: account['id']
+            for account in AnalyticAccount.search_read(
+                [('plan_id', '=', plan.id), ('name', 'in', names)], ['name'], order='id desc',
+            )
+        }
+        missing_names = [name for name in names if name not in account_ids]
+        if missing_names:
+            accounts = AnalyticAccount.create([{'name': name, 'plan_id': plan.id} for name in missing_names])
+            account_ids.update(zip(missing_names, accounts.ids))
+        return account_ids
+
+    @api.model
+    def _defer_location_provisioning(self):
+        """
+        Whether country and region analytic accounts are left to the
+        provisioning job instead of being created with the records.
+        """
+        return bool(self.env.context.get('install_mode')) or bool(self.env['ir.config_parameter'].sudo().get_param(
+            'bista_accounting_customization.defer_location_analytic_accounts'))
+
+    @api.model
+    def _cron_provision_location_accounts(self):
+        """ Create the missing analytic accounts of all countries and country groups. """
+        self.env['res.country'].search([])._create_country_analytic_accounts()
+        self.env['res.country.group'].search([])._create_region_analytic_accounts()
+
 
 class AccountAnalyticPlan(models.Model):
     _inherit = 'account.analytic.plan'
@@ -59,6 +111,33 @@ class AccountAnalyticPlan(models.Model):
         help="If checked, this plan can be used for parent-level country groups"
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        plans = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return plans
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(ELIGIBILITY_FIELDS) & vals.keys():
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    def _get_eligible_plan(self, eligibility_field):
+        """ Return the first plan flagged with `eligibility_field` (sudo), or an empty recordset. """
+        return self.sudo().browse(self._get_eligible_plan_id(eligibility_field))
+
+    @tools.ormcache('eligibility_field')
+    def _get_eligible_plan_id(self, eligibility_field):
+        plan = self.sudo().search([(eligibility_field, '=', True)], limit=1)
+        return plan.id or None
+
     @api.model
     def get_relevant_plans(self, **kwargs):
         """
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+
+from odoo import models, fields, api
+from odoo.tools.safe_eval import safe_eval
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_TIME_LIMIT = 300
+
+
+class AnalyticRedistributionJob(models.Model):
+    """
+    Background re-derivation of analytic distributions on existing journal
+    items, e.g. after a department or country mapping changed.
+
+    Matching lines are processed by ascending id in batches, with a commit
+    after each batch. `last_line_id` is the resume watermark: a crashed or
+    interrupted run continues from the last committed batch.
+    """
+    _name = 'account.analytic.redistribution.job'
+    _description = 'Analytic Redistribution Job'
+    _order = 'id desc'
+
+    name = fields.Char(required=True)
+    company_id = fields.Many2one('res.company', string='Company', required=True, default=lambda self: self.env.company)
+    domain = fields.Text(required=True, default='[]', help="Domain on journal items to redistribute")
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'In Progress'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], default='pending', required=True, readonly=True)
+    last_line_id = fields.Integer(readonly=True, help="Id of the last journal item processed")
+    line_count = fields.Integer(string='Journal Items', readonly=True)
+    processed_count = fields.Integer(string='Processed', readonly=True)
+    updated_count = fields.Integer(string='Updated', readonly=True)
+    progress = fields.Float(compute='_compute_progress')
+    error = fields.Text(readonly=True)
+
+    @api.depends('line_count', 'processed_count', 'state')
+    def _compute_progress(self):
+        for job in self:
+            if job.state == 'done':
+                job.progress = 100
+            elif job.line_count:
+                job.progress = min(100.0, 100.0 * job.processed_count / job.line_count)
+            else:
+                job.progress = 0
+
+    @api.model
+    def _enqueue(self, name, domain, company=None):
+        """ Queue a redistribution of the journal items matching `domain`. """
+        job = self.sudo().create({
+            'name': name,
+            'domain': repr(domain),
+            'company_id': (company or self.env.company).id,
+        })
+        self.env.ref('bista_accounting_customization.ir_cron_process_redistribution_jobs')._trigger()
+        return job
+
+    def _get_line_domain(self):
+        self.ensure_one()
+        return safe_eval(self.domain or '[]') + [('company_id', '=', self.company_id.id)]
+
+    def action_retry(self):
+        self.filtered(lambda job: job.state == 'failed').write({'state': 'pending', 'error': False})
+        self.env.ref('bista_accounting_customization.ir_cron_process_redistribution_jobs')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """
+        Recompute the flagged partners, then work through the queued jobs,
+        until done or out of time; re-trigger if work remains.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        batch_size = int(get_param('bista_accounting_customization.redistribution_batch_size', DEFAULT_BATCH_SIZE))
+        deadline = time.monotonic() + int(get_param(
+            'bista_accounting_customization.redistribution_time_limit', DEFAULT_TIME_LIMIT))
+
+        # Journal items read the partners' distribution, refresh those first
+        if not self.env['res.partner']._recompute_pending_analytic_distributions(batch_size, deadline):
+            self.env.ref('bista_accounting_customization.ir_cron_process_redistribution_jobs')._trigger()
+            return
+
+        for job in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            if not job._run(batch_size, deadline):
+                self.env.ref('bista_accounting_customization.ir_cron_process_redistribution_jobs')._trigger()
+                return
+
+    def _run(self, batch_size, deadline):
+        """
+        Process batches of this job until it is finished or `deadline` is hit.
+
+        Returns:
+            bool: False if the job was interrupted by the deadline
+        """
+        self.ensure_one()
+        MoveLine = self.env['account.move.line'].with_company(self.company_id)
+        domain = self._get_line_domain()
+        if self.state == 'pending':
+            self.write({
+                'state': 'running',
+                'line_count': MoveLine.search_count(domain),
+                'processed_count': 0,
+                'updated_count': 0,
+                'last_line_id': 0,
+            })
+            self._commit()
+
+        while time.monotonic() < deadline:
+            lines = MoveLine.search(domain + [('id', '>', self.last_line_id)], order='id', limit=batch_size)
+            if not lines:
+                self.state = 'done'
+                self._commit()
+                _logger.info("Analytic redistribution job %s done: %s/%s journal items updated",
+                             self.id, self.updated_count, self.processed_count)
+                return True
+            try:
+                updated = lines._recompute_analytic_distribution(use_line_user=True)
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Analytic redistribution job %s failed after line %s", self.id, self.last_line_id)
+                self.write({'state': 'failed', 'error': str(e)})
+                self._commit()
+                return True
+            self.write({
+                'last_line_id': lines[-1].id,
+                'processed_count': self.processed_count + len(lines),
+                'updated_count': self.updated_count + updated,
+            })
+            self._commit()
+            # Batches are independent, don't let the caches grow with the job
+            self.env.invalidate_all()
+            MoveLine._invalidate_analytic_distribution_cache()
+            _logger.info("Analytic redistribution job %s: %s/%s journal items processed",
+                         self.id, self.processed_count, self.line_count)
+        return False
+
+    def _commit(self):
+        if not self.env.registry.in_test_mode():
+            self.env.cr.commit()
@@ -3,6 +3,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 
+COUNTRY_DISTRIBUTION_CACHE_KEY = 'bista_accounting_customization.country_distributions'
+
 
 class CountryGroupAnalyticDistribution(models.Model):
     _name = 'country.group.analytic.distribution'
@@ -39,6 +41,76 @@ class CountryGroupAnalyticDistribution(models.Model):
     #      'Each country group can only have one analytic distribution per company!')
     # ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._invalidate_country_distribution_index()
+        records._enqueue_redistribution()
+        return records
+
+    def write(self, vals):
+        enqueue = not self.env.context.get('skip_country_redistribution')
+        if enqueue and 'country_id' in vals:
+            self._enqueue_redistribution()
+        res = super().write(vals)
+        self._invalidate_country_distribution_index()
+        if enqueue and {'country_id', 'company_id', 'analytic_distribution'} & vals.keys():
+            self._enqueue_redistribution()
+        return res
+
+    def unlink(self):
+        self._enqueue_redistribution()
+        res = super().unlink()
+        self._invalidate_country_distribution_index()
+        return res
+
+    @api.model
+    def _get_country_distribution_index(self, country_ids):
+        """
+        Map each of `country_ids` to the merged analytic distribution of its
+        mappings (all companies, in id order). Missing countries are fetched
+        with a single read and kept for the rest of the transaction.
+
+        Returns:
+            dict: {country_id: distribution dict}
+        """
+        index = self.env.cr.cache.setdefault(COUNTRY_DISTRIBUTION_CACHE_KEY, {})
+        missing_ids = [country_id for country_id in set(country_ids) if country_id and country_id not in index]
+        if missing_ids:
+            index.update(dict.fromkeys(missing_ids, {}))
+            mappings = self.sudo().search_read(
+                [('country_id', 'in', missing_ids)],
+                ['country_id', 'analytic_distribution'],
+                order='id',
+                load=None,
+            )
+            for mapping in mappings:
+                if mapping['analytic_distribution']:
+                    index[mapping['country_id']] = {**index[mapping['country_id']], **mapping['analytic_distribution']}
+        return {country_id: index.get(country_id, {}) for country_id in country_ids}
+
+    @api.model
+    def _invalidate_country_distribution_index(self):
+        self.env.cr.cache.pop(COUNTRY_DISTRIBUTION_CACHE_KEY, None)
+        self.env['account.move.line']._invalidate_analytic_distribution_cache()
+
+    def _enqueue_redistribution(self):
+        """
+        Flag the partners of the mapped countries for recompute, then queue a
+        redistribution of their journal items, per company.
+        """
+        self.env['res.partner']._mark_analytic_distribution_pending(self.country_id.ids)
+        countries_by_company = {}
+        for mapping in self:
+            countries_by_company.setdefault(mapping.company_id, mapping.country_id)
+            countries_by_company[mapping.company_id] |= mapping.country_id
+        for company, countries in countries_by_company.items():
+            self.env['account.analytic.redistribution.job']._enqueue(
+                f"Countries - {', '.join(countries.mapped('name'))}",
+                [('partner_id.country_id', 'in', countries.ids)],
+                company=company,
+            )
+
     @api.model
     def get_distribution_for_country_group(self, country_group_id, company_id=None):
         """
@@ -62,47 +134,11 @@ class CountryGroupAnalyticDistribution(models.Model):
         return mapping.analytic_distribution if mapping else {}
 
     def action_syc_country_analytics(self):
-        Country = self.env['res.country']
-        CountryGroup = self.env['res.country.group']
-        AnalyticPlan = self.env['account.analytic.plan']
         AnalyticAccount = self.env['account.analytic.account']
+        country_plan, region_plan = self._get_location_plans()
 
-        # Get eligible plans
-        country_plan = AnalyticPlan.search([('is_eligible_country', '=', True)], limit=1)
-        region_plan = AnalyticPlan.search([('is_eligible_region', '=', True)], limit=1)
-        if not country_plan:
-            raise UserError("No analytic plan is marked as 'Eligible for Country'. Please configure one first.")
-
-        if not region_plan:
-            raise UserError("No analytic plan is marked as 'Eligible for Region'. Please configure one first.")
-
-        # Pre-fetch all analytic accounts for performance
-        country_analytics = {
-            aa.name: aa.id
-            for aa in AnalyticAccount.search([('plan_id', '=', country_plan.id)])
-        }
-        region_analytics = {
-            aa.name: aa.id
-            for aa in AnalyticAccount.search([('plan_id', '=', region_plan.id)])
-        }
-
-        countries = Country.search([])
-        regions = CountryGroup.search([])
-        analytic_acc_val_list = []
-        for country in countries:
-            if not country_analytics.get(country.name, False):
-                analytic_acc_val_list.append({
-                    'plan_id': country_plan.id,
-                    'name': country.name
-                })
-        for region in regions:
-            if not region_analytics.get(region.name, False):
-                analytic_acc_val_list.append({
-                    'plan_id': region_plan.id,
-                    'name': region.name
-                })
-        if analytic_acc_val_list:
-            recs = AnalyticAccount.create(analytic_acc_val_list) if analytic_acc_val_list else AnalyticAccount
+        AnalyticAccount._provision_accounts(country_plan, self.env['res.country'].search([]).mapped('name'))
+        AnalyticAccount._provision_accounts(region_plan, self.env['res.country.group'].search([]).mapped('name'))
 
         return {
             'success': {
@@ -111,113 +147,199 @@ class CountryGroupAnalyticDistribution(models.Model):
             }
         }
 
-
     def action_automatic_entry(self):
-        # Bulk create Country Analytic Distribution records
+        # Sync Country Analytic Distribution records of the selected companies
         # Links each country to its analytic account + all its country groups' analytic accounts
+        results = self._sync_country_distributions(self.env.companies)
 
-        CountryAnalytic = self.env['country.group.analytic.distribution']
-        Country = self.env['res.country']
-        CountryGroup = self.env['res.country.group']
-        AnalyticAccount = self.env['account.analytic.account']
-        AnalyticPlan = self.env['account.analytic.plan']
+        msg_parts = []
+        for company, result in results.items():
+            if result['created'] or result['updated']:
+                msg_parts.append("%s: created %d and updated %d analytic distribution records." % (
+                    company.name, result['created'], result['updated']))
+            skipped_countries = result['skipped']
+            if skipped_countries:
+                msg_parts.append("%s: skipped %d countries (no matching analytic accounts): %s" % (
+                    company.name, len(skipped_countries), ', '.join(skipped_countries[:10])))
+                if len(skipped_countries) > 10:
+                    msg_parts[-1] += '...'
+        if not msg_parts:
+            msg_parts.append("Country analytic distributions are already up to date for %s." % ', '.join(
+                self.env.companies.mapped('name')))
+
+        return {
+            'warning': {
+                'title': _("Information"),
+                'message': _('\n\n'.join(msg_parts)),
+            }
+        }
 
-        current_company = self.env.company
+    @api.model
+    def _get_location_plans(self):
+        AnalyticPlan = self.env['account.analytic.plan']
 
         # Get eligible plans
-        country_plan = AnalyticPlan.search([('is_eligible_country', '=', True)], limit=1)
-        region_plan = AnalyticPlan.search([('is_eligible_region', '=', True)], limit=1)
-
+        country_plan = AnalyticPlan._get_eligible_plan('is_eligible_country')
+        region_plan = AnalyticPlan._get_eligible_plan('is_eligible_region')
         if not country_plan:
             raise UserError("No analytic plan is marked as 'Eligible for Country'. Please configure one first.")
 
         if not region_plan:
             raise UserError("No analytic plan is marked as 'Eligible for Region'. Please configure one first.")
+        return country_plan, region_plan
+
+    @api.model
+    def _sync_country_distributions(self, companies):
+        """
+        Incrementally sync the country distributions of `companies`.
+
+        Only countries affected by a change since the company's last sync
+        are rebuilt: changed countries, members of changed country groups
+        and countries or groups whose analytic account changed, plus every
+        country that has an analytic account but no distribution in the
+        company (e.g. deleted by a user). A company that was never synced
+        gets a full build.
+
+        The watermark stored on the company is the last write_date that was
+        processed, not the time of the sync, so changes committed by
+        concurrent transactions while the sync ran are picked up next time.
 
-        # Pre-fetch all analytic accounts for performance
+        Returns:
+            dict: {company: {'created': int, 'updated': int, 'skipped': [country names]}}
+        """
+        country_plan, region_plan = self._get_location_plans()
+        results = {}
+        changes_by_watermark = {}
+        # Countries without an account are skipped anyway, don't retry them on every sync
+        country_account_names = self.env['account.analytic.account'].sudo().search([
+            ('plan_id', '=', country_plan.id),
+        ]).mapped('name')
+        for company in companies:
+            watermark = company.sudo().country_distribution_sync_date
+            if watermark not in changes_by_watermark:
+                changes_by_watermark[watermark] = self._get_changed_countries(watermark, country_plan, region_plan)
+            countries, last_write_date = changes_by_watermark[watermark]
+            unmapped_countries = self.env['res.country'].search([
+                ('id', 'not in', self.search([('company_id', '=', company.id)]).country_id.ids),
+                ('name', 'in', country_account_names),
+            ])
+            results[company] = self._sync_countries(
+                company, countries | unmapped_countries, country_plan, region_plan)
+            if last_write_date:
+                company.sudo().country_distribution_sync_date = last_write_date
+        return results
+
+    @api.model
+    def _get_changed_countries(self, watermark, country_plan, region_plan):
+        """
+        Countries affected by changes after `watermark` (all of them without
+        watermark), and the last write_date among those changes.
+        """
+        Country = self.env['res.country']
+        CountryGroup = self.env['res.country.group']
+        changed_domain = [('write_date', '>', watermark)] if watermark else []
+
+        countries = Country.search(changed_domain)
+        groups = CountryGroup.search(changed_domain)
+        accounts = self.env['account.analytic.account'].sudo().search([
+            ('plan_id', 'in', (country_plan | region_plan).ids),
+        ] + changed_domain)
+        write_dates = countries.mapped('write_date') + groups.mapped('write_date') + accounts.mapped('write_date')
+
+        account_names = accounts.mapped('name')
+        if account_names and watermark:
+            countries |= Country.search([('name', 'in', account_names)])
+            groups |= CountryGroup.search([('name', 'in', account_names)])
+        countries |= Country.browse(CountryGroup._get_countries_of_groups(groups.ids))
+        return countries, max(write_dates, default=watermark)
+
+    @api.model
+    def _sync_countries(self, company, countries, country_plan, region_plan):
+        """ Create or update the distributions of `countries` in `company`. """
+        result = {'created': 0, 'updated': 0, 'skipped': []}
+        if not countries:
+            return result
+
+        AnalyticAccount = self.env['account.analytic.account'].sudo()
+
+        # Mapping: country -> country groups, shared membership map of res.country.group
+        membership = self.env['res.country.group']._get_country_membership()
+        groups = self.env['res.country.group'].browse({
+            group_id
+            for country_id in countries.ids
+            for group_id in membership.get(country_id, ())
+        })
+        group_names = {group.id: group.name for group in groups}
+        country_to_groups = {
+            country_id: [group_names[group_id] for group_id in membership.get(country_id, ())]
+            for country_id in countries.ids
+        }
+
+        # Analytic accounts of the countries and their groups only
         country_analytics = {
-            aa.name: aa.id
-            for aa in AnalyticAccount.search([('plan_id', '=', country_plan.id)])
+            account['name']: account['id']
+            for account in AnalyticAccount.search_read(
+                [('plan_id', '=', country_plan.id), ('name', 'in', countries.mapped('name'))], ['name'])
         }
         region_analytics = {
-            aa.name: aa.id
-            for aa in AnalyticAccount.search([('plan_id', '=', region_plan.id)])
+            account['name']: account['id']
+            for account in AnalyticAccount.search_read(
+                [('plan_id', '=', region_plan.id), ('name', 'in', groups.mapped('name'))], ['name'])
         }
 
-        # Get existing country IDs for current company (to skip)
-        existing_country_ids = CountryAnalytic.search([
-            ('company_id', '=', current_company.id)
-        ]).mapped('country_id').ids
-
-        # Get all countries without existing records
-        countries = Country.search([('id', 'not in', existing_country_ids)])
-
-        if not countries:
-            raise UserError("All countries already have analytic distribution records for %s" % current_company.name)
-
-        # Build mapping: country -> country groups
-        # In Odoo, res.country.group has country_ids (Many2many to res.country)
-        country_to_groups = {}
-        all_groups = CountryGroup.search([])
-        for group in all_groups:
-            for country in group.country_ids:
-                if country.id not in country_to_groups:
-                    country_to_groups[country.id] = []
-                country_to_groups[country.id].append(group.name)
+        existing = {
+            mapping.country_id.id: mapping
+            for mapping in self.search([('company_id', '=', company.id), ('country_id', 'in', countries.ids)])
+        }
 
         vals_list = []
-        skipped_countries = []
-
+        updated = self.browse()
         for country in countries:
-            analytic_distribution = {}
-
-            # 1. Add country's analytic account
-            str_analytic_ids = ''
-            country_analytic_id = country_analytics.get(country.name)
-            if country_analytic_id:
-                str_analytic_ids = str(country_analytic_id)
-
-            # 2. Add all country groups' analytic accounts
-            group_names = country_to_groups.get(country.id, [])
-            first_group_added = False
-            for group_name in group_names:
-                region_analytic_id = region_analytics.get(group_name)
-                if region_analytic_id and not first_group_added:
-                    str_analytic_ids += ',' + str(region_analytic_id)
-                    first_group_added = True
-                elif region_analytic_id:
-                    analytic_distribution[str(region_analytic_id)] = 100
-            analytic_distribution[str(str_analytic_ids)] = 100
+            analytic_distribution = self._build_country_distribution(
+                country_analytics.get(country.name),
+                [region_analytics.get(name) for name in country_to_groups.get(country.id, [])],
+            )
 
             # Only create if we have at least the country analytic
             if not analytic_distribution:
-                skipped_countries.append(country.name)
+                result['skipped'].append(country.name)
                 continue
 
-            vals_list.append({
-                'country_id': country.id,
-                'company_id': current_company.id,
-                'analytic_distribution': analytic_distribution,
-            })
+            mapping = existing.get(country.id)
+            if not mapping:
+                vals_list.append({
+                    'country_id': country.id,
+                    'company_id': company.id,
+                    'analytic_distribution': analytic_distribution,
+                })
+            elif mapping.analytic_distribution != analytic_distribution:
+                # Redistribution is queued once for all updated mappings below
+                mapping.with_context(skip_country_redistribution=True).analytic_distribution = analytic_distribution
+                updated |= mapping
 
+        updated._enqueue_redistribution()
+        result['updated'] = len(updated)
         # Batch create
-        created_records = CountryAnalytic.create(vals_list) if vals_list else CountryAnalytic
-
-        # Summary message
-        msg_parts = []
-        if created_records:
-            msg_parts.append("Successfully created %d analytic distribution records for %s." % (len(created_records),
-                                                                                                current_company.name))
-        if skipped_countries:
-            msg_parts.append("Skipped %d countries (no matching analytic accounts): %s" % (len(skipped_countries),
-                                                                                           ', '.join(
-                                                                                               skipped_countries[:10])))
-            if len(skipped_countries) > 10:
-                msg_parts[-1] += '...'
+        result['created'] = len(self.create(vals_list)) if vals_list else 0
+        return result
 
-        return {
-            'warning': {
-                'title': _("Information"),
-                'message': _('\n\n'.join(msg_parts)),
-            }
-        }
+    @api.model
+    def _build_country_distribution(self, country_analytic_id, region_analytic_ids):
+        """
+        Distribution of a country: its analytic account combined with its
+        first region's account on one line, then each other region at 100%.
+        Empty when the country has no analytic account.
+        """
+        if not country_analytic_id:
+            return {}
+        analytic_distribution = {}
+        str_analytic_ids = str(country_analytic_id)
+        first_group_added = False
+        for region_analytic_id in region_analytic_ids:
+            if region_analytic_id and not first_group_added:
+                str_analytic_ids += ',' + str(region_analytic_id)
+                first_group_added = True
+            elif region_analytic_id:
+                analytic_distribution[str(region_analytic_id)] = 100
+        analytic_distribution[str_analytic_ids] = 100
+        return analytic_distribution
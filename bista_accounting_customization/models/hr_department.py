@@ -8,3 +8,15 @@ class HrDepartment(models.Model):
     _inherit = ['hr.department', 'analytic.mixin']
 
     analytic_distribution = fields.Json(required=True)
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'analytic_distribution' in vals:
+            self.env['account.move.line']._invalidate_analytic_distribution_cache()
+            for department in self:
+                self.env['account.analytic.redistribution.job']._enqueue(
+                    f"Department - {department.display_name}",
+                    [('move_id.invoice_user_id.employee_ids.department_id', '=', department.id)],
+                    company=department.company_id or self.env.company,
+                )
+        return res
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
+from odoo.tools import SQL
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
@@ -16,10 +18,18 @@ class ResPartner(models.Model):
         help="Analytic account automatically created for this partner"
     )
     analytic_distribution = fields.Json(compute='_compute_analytic_distribution', store=True)
+    analytic_distribution_pending = fields.Boolean(
+        index='btree_not_null',
+        copy=False,
+        help="Set when a country mapping changed; the distribution is recomputed in the background"
+    )
     # country_group_distribution_ids = fields.One2many('country.group.analytic.distribution', 'country_id')
 
     @api.depends('country_id', 'analytic_account_id')
     def _compute_analytic_distribution(self):
+        country_distributions = self.env['country.group.analytic.distribution']._get_country_distribution_index(
+            self.country_id.ids
+        )
         for rec in self:
             distributions = {}
 
@@ -27,35 +37,137 @@ class ResPartner(models.Model):
             if rec.analytic_account_id:
                 distributions.update({str(rec.analytic_account_id.id):100})
 
-            country_group_distributions = self.env['country.group.analytic.distribution'].sudo().search([
-                ('country_id', '=', rec.country_id.id)
-            ])
-            for group_distribution in country_group_distributions:
-                if group_distribution.analytic_distribution:
-                    distributions.update(group_distribution.analytic_distribution)
+            distributions.update(country_distributions.get(rec.country_id.id, {}))
             rec.analytic_distribution = distributions
 
+    @api.model
+    def _mark_analytic_distribution_pending(self, country_ids):
+        """ Flag the partners of `country_ids` for a background recompute of their distribution. """
+        if not country_ids:
+            return
+        self.env.cr.execute(SQL(
+            "UPDATE res_partner SET analytic_distribution_pending = TRUE WHERE country_id IN %s",
+            tuple(country_ids),
+        ))
+        self.invalidate_model(['analytic_distribution_pending'])
+        self.env.ref('bista_accounting_customization.ir_cron_process_redistribution_jobs')._trigger()
+
+    @api.model
+    def _recompute_pending_analytic_distributions(self, batch_size, deadline):
+        """
+        Recompute the flagged partners by batches of `batch_size`, committing
+        after each batch, until none is left or `deadline` is hit.
+
+        Returns:
+            bool: False if interrupted by the deadline
+        """
+        Partner = self.sudo().with_context(active_test=False)
+        field = self._fields['analytic_distribution']
+        while time.monotonic() < deadline:
+            partner_ids = [row[0] for row in self.env.execute_query(SQL(
+                "SELECT id FROM res_partner WHERE analytic_distribution_pending ORDER BY id LIMIT %s",
+                batch_size,
+            ))]
+            if not partner_ids:
+                return True
+            partners = Partner.browse(partner_ids)
+            self.env.add_to_compute(field, partners)
+            partners.flush_recordset(['analytic_distribution'])
+            self.env.cr.execute(SQL(
+                "UPDATE res_partner SET analytic_distribution_pending = NULL WHERE id IN %s",
+                tuple(partner_ids),
+            ))
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+            _logger.info("Recomputed analytic distribution of %s partners", len(partner_ids))
+        return False
+
     @api.model_create_multi
     def create(self, vals_list):
         partners = super().create(vals_list)
-        partners._create_analytic_accounts()
+        if not self._is_analytic_account_lazy():
+            partners._create_analytic_accounts()
         return partners
 
+    def write(self, vals):
+        res = super().write(vals)
+        if {'country_id', 'analytic_account_id', 'analytic_distribution'} & vals.keys():
+            self.env['account.move.line']._invalidate_analytic_distribution_cache()
+        return res
+
+    @api.model
+    def _is_analytic_account_lazy(self):
+        """
+        In lazy mode partner analytic accounts are not created with the
+        partner, but when a journal item first needs the partner's
+        distribution, or by the nightly backfill.
+        """
+        return self.env['ir.config_parameter'].sudo().get_param(
+            'bista_accounting_customization.partner_analytic_account_mode', 'eager') == 'lazy'
+
+    def _ensure_analytic_accounts(self):
+        """ Lazy mode: create the missing analytic accounts of these partners before first use. """
+        if self and self._is_analytic_account_lazy():
+            self.sudo().filtered(lambda p: not p.analytic_account_id)._create_analytic_accounts()
+
+    @api.model
+    def _cron_backfill_analytic_accounts(self, batch_size=1000):
+        """
+        Create the analytic accounts still missing, by committed batches.
+        In lazy mode only partners that already have journal items are
+        provisioned.
+        """
+        if not self.env['account.analytic.plan']._get_eligible_plan('is_eligible_customer'):
+            return
+        used_only = SQL(
+            "AND EXISTS (SELECT 1 FROM account_move_line aml WHERE aml.partner_id = res_partner.id)"
+        ) if self._is_analytic_account_lazy() else SQL()
+        Partner = self.sudo().with_context(active_test=False)
+        while True:
+            partner_ids = [row[0] for row in self.env.execute_query(SQL(
+                """
+                SELECT id
+                  FROM res_partner
+                 WHERE analytic_account_id IS NULL
+                   %s
+              ORDER BY id
+                 LIMIT %s
+                """,
+                used_only,
+                batch_size,
+            ))]
+            if not partner_ids:
+                return
+            partners = Partner.browse(partner_ids)
+            partners._create_analytic_accounts()
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            self.env.invalidate_all()
+            _logger.info("Created analytic accounts for %s partners", len(partners))
+
     def _create_analytic_accounts(self):
-        """Create analytic accounts for partners that don't have one."""
-        plan = self.env['account.analytic.plan'].sudo().search([
-            ('is_eligible_customer', '=', True)
-        ], limit=1)
+        """
+        Create analytic accounts for partners that don't have one.
+        All accounts are created in a single batch, then linked back to
+        their partners through the ORM.
+        """
+        plan = self.env['account.analytic.plan']._get_eligible_plan('is_eligible_customer')
 
         if not plan:
             # You may want to raise an error or log a warning here
             return
 
-        for partner in self:
-            if not partner.analytic_account_id:
-                analytic_account = self.env['account.analytic.account'].sudo().create({
-                    'name': f"Partner - {partner.name}",
-                    'plan_id': plan.id,
-                    'partner_id': partner.id,
-                })
-                partner.analytic_account_id = analytic_account
+        partners = self.filtered(lambda p: not p.analytic_account_id)
+        if not partners:
+            return
+
+        analytic_accounts = self.env['account.analytic.account'].sudo().create([{
+            'name': f"Partner - {partner.name}",
+            'plan_id': plan.id,
+            'partner_id': partner.id,
+        } for partner in partners])
+
+        # Each partner gets its own account; the ORM batches the updates at flush
+        for partner, account in zip(partners, analytic_accounts):
+            partner.write({'analytic_account_id': account.id})
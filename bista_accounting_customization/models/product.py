@@ -43,3 +43,9 @@ class ProductTemplateInherit(models.Model):
                 dist.update(product.categ_id.analytic_distribution)
 
             product.analytic_distribution = dist
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'product_brand_id', 'categ_id', 'analytic_distribution'} & vals.keys():
+            self.env['account.move.line']._invalidate_analytic_distribution_cache()
+        return res
@@ -6,3 +6,9 @@ class ProductBrand(models.Model):
 
     analytic_distribution = fields.Json(required=True)
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'analytic_distribution' in vals:
+            self.env['account.move.line']._invalidate_analytic_distribution_cache()
+        return res
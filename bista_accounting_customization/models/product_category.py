@@ -11,6 +11,12 @@ class ProductCategory(models.Model):
     company_id = fields.Many2one(
         'res.company', string='Company', default=lambda self: self.env.company)
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'analytic_distribution' in vals:
+            self.env['account.move.line']._invalidate_analytic_distribution_cache()
+        return res
+
     def action_automatic_sync_analytics(self):
         AnalyticPlan = self.env['account.analytic.plan']
         AnalyticAccount = self.env['account.analytic.account']
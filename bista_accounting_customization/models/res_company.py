@@ -0,0 +1,12 @@
+from odoo import fields, models
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    country_distribution_sync_date = fields.Datetime(
+        string="Country Distributions Synced On",
+        copy=False,
+        help="Countries, country groups and analytic accounts changed after this date are "
+             "resynchronized on the next country distribution sync"
+    )
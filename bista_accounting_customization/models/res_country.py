@@ -8,31 +8,27 @@ class ResCountry(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        records._create_country_analytic_accounts()
+        if self.env['account.analytic.account']._defer_location_provisioning():
+            self.env.ref('bista_accounting_customization.ir_cron_provision_location_analytic_accounts')._trigger()
+        else:
+            records._create_country_analytic_accounts()
+        if any(vals.get('country_group_ids') for vals in vals_list):
+            # Country membership map of res.country.group
+            self.env.registry.clear_cache()
         return records
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'country_group_ids' in vals:
+            # Country membership map of res.country.group
+            self.env.registry.clear_cache()
+        return res
+
     def _create_country_analytic_accounts(self):
         """Create analytic accounts for countries under the eligible country plan."""
-        AnalyticAccount = self.env['account.analytic.account']
-        AnalyticPlan = self.env['account.analytic.plan']
-
-        # Find the first plan eligible for countries
-        country_plan = AnalyticPlan.search([
-            ('is_eligible_country', '=', True)
-        ], limit=1)
+        country_plan = self.env['account.analytic.plan']._get_eligible_plan('is_eligible_country')
 
         if not country_plan:
             return  # No eligible plan configured, skip silently
 
-        for country in self:
-            # Check if analytic account with same name already exists under this plan
-            existing = AnalyticAccount.search([
-                ('name', '=', country.name),
-                ('plan_id', '=', country_plan.id)
-            ], limit=1)
-
-            if not existing:
-                AnalyticAccount.create({
-                    'name': country.name,
-                    'plan_id': country_plan.id,
-                })
+        self.env['account.analytic.account']._provision_accounts(country_plan, self.mapped('name'))
@@ -1,4 +1,5 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+from odoo.tools import SQL
 
 
 class ResCountryGroup(models.Model):
@@ -7,31 +8,63 @@ class ResCountryGroup(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        records._create_region_analytic_accounts()
+        if self.env['account.analytic.account']._defer_location_provisioning():
+            self.env.ref('bista_accounting_customization.ir_cron_provision_location_analytic_accounts')._trigger()
+        else:
+            records._create_region_analytic_accounts()
+        self.env.registry.clear_cache()
         return records
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'country_ids' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @tools.ormcache()
+    def _get_country_membership(self):
+        """
+        Country -> country groups membership, read from the relation table
+        in one query and cached until the groups or their countries change.
+
+        Returns:
+            dict: {country_id: (group_id, ...)} with groups in id order
+        """
+        field = self._fields['country_ids']
+        self.flush_model(['country_ids'])
+        rows = self.env.execute_query(SQL(
+            "SELECT %s, %s FROM %s ORDER BY %s, %s",
+            SQL.identifier(field.column2),
+            SQL.identifier(field.column1),
+            SQL.identifier(field.relation),
+            SQL.identifier(field.column2),
+            SQL.identifier(field.column1),
+        ))
+        membership = {}
+        for country_id, group_id in rows:
+            membership.setdefault(country_id, []).append(group_id)
+        return {country_id: tuple(group_ids) for country_id, group_ids in membership.items()}
+
+    @api.model
+    def _get_countries_of_groups(self, group_ids):
+        """ Ids of the member countries of `group_ids`, from the cached membership. """
+        group_ids = set(group_ids)
+        return [
+            country_id
+            for country_id, country_group_ids in self._get_country_membership().items()
+            if group_ids.intersection(country_group_ids)
+        ]
+
     def _create_region_analytic_accounts(self):
         """Create analytic accounts for country groups under the eligible region plan."""
-        AnalyticAccount = self.env['account.analytic.account']
-        AnalyticPlan = self.env['account.analytic.plan']
-
-        # Find the first plan eligible for regions
-        region_plan = AnalyticPlan.search([
-            ('is_eligible_region', '=', True)
-        ], limit=1)
+        region_plan = self.env['account.analytic.plan']._get_eligible_plan('is_eligible_region')
 
         if not region_plan:
             return  # No eligible plan configured, skip silently
 
-        for group in self:
-            # Check if analytic account with same name already exists under this plan
-            existing = AnalyticAccount.search([
-                ('name', '=', group.name),
-                ('plan_id', '=', region_plan.id)
-            ], limit=1)
-
-            if not existing:
-                AnalyticAccount.create({
-                    'name': group.name,
-                    'plan_id': region_plan.id,
-                })
+        self.env['account.analytic.account']._provision_accounts(region_plan, self.mapped('name'))
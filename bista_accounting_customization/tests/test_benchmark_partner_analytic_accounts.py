@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import time
+
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'benchmark')
+class TestBenchmarkPartnerAnalyticAccounts(TransactionCase):
+    """
+    Partner import with analytic account provisioning, 100k partners by
+    default (see the BISTA_BENCHMARK_PARTNERS environment variable).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner_count = int(os.environ.get('BISTA_BENCHMARK_PARTNERS', 100000))
+        cls.env['account.analytic.plan'].create({
+            'name': 'Benchmark Customers',
+            'is_eligible_customer': True,
+        })
+
+    def _create_partners(self, mode, prefix):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'bista_accounting_customization.partner_analytic_account_mode', mode)
+        return self.env['res.partner'].create([
+            {'name': f"{prefix} {index}"} for index in range(self.partner_count)
+        ])
+
+    def _measure(self, label, func):
+        query_count = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        result = func()
+        self.env.flush_all()
+        _logger.info(
+            "%s: %s partners, %.3fs, %s queries",
+            label, self.partner_count, time.perf_counter() - start, self.env.cr.sql_log_count - query_count,
+        )
+        return result
+
+    def test_benchmark_partner_import(self):
+        partners = self._measure('Eager import', lambda: self._create_partners('eager', 'Eager'))
+        self.assertFalse(partners.filtered(lambda p: not p.analytic_account_id))
+
+    def test_benchmark_partner_provisioning(self):
+        partners = self._create_partners('lazy', 'Lazy')
+        self.env.flush_all()
+        self.assertFalse(partners.analytic_account_id)
+        self._measure('Bulk provisioning', partners._create_analytic_accounts)
+        self.assertFalse(partners.filtered(lambda p: not p.analytic_account_id))